@@ -12,65 +12,25 @@ router.get('/queryLookUp1', async (req, res) => {
         }
 
         const db_mongo = getMongo();
-        let locationIds = [];
-
-        // Trova gli ID delle location in base al tipo e nome specificato
-        switch(type.toLowerCase()) {
-            case 'city':
-                const city = await db_mongo.collection('Place').findOne({
-                    name: name,
-                    type: 'city'
-                });
-
-                if (city) locationIds.push(city.id);
-                break;
-
-            case 'country':
-                const country = await db_mongo.collection('Place').findOne({
-                    name: name,
-                    type: 'country'
-                });
-
-                if (country) {
-                    const cities = await db_mongo.collection('PlaceIsPartOfPlace').find({
-                        "placeFrom": country.id,
-                    }).toArray();
-
-                    locationIds = cities.map(city => city.placeTo);
-                }
-                break;
-
-            case 'continent':
-                const continent = await db_mongo.collection('Place').findOne({
-                    name: name,
-                    type: 'continent'
-                });
-
-                if (continent) {
-                    const countries = await db_mongo.collection('PlaceIsPartOfPlace').find({
-                        "placeFrom": continent.id,
-                    }).toArray();
-
-                    for (const country of countries) {
-                        const cities = await db_mongo.collection('PlaceIsPartOfPlace').find({
-                            "placeFrom": country.placeTo,
-                        }).toArray();
-
-                        locationIds = [...locationIds, ...cities.map(city => city.placeTo)];
-                    }
-                }
-                break;
-
-            default:
-                return res.status(400).json({ error: 'Location type must be city, country, or continent' });
+        const placeType = type.toLowerCase();
+
+        if (!['city', 'country', 'continent'].includes(placeType)) {
+            return res.status(400).json({ error: 'Location type must be city, country, or continent' });
         }
 
-        if (locationIds.length === 0) {
+        // Trova il luogo in base al tipo e nome specificato
+        const place = await db_mongo.collection('Place').findOne({
+            name: name,
+            type: placeType
+        });
+
+        if (!place) {
             return res.json({ message: 'No locations found matching the criteria', people: [] });
         }
 
+        // placePath contiene il luogo di ogni persona e i suoi antenati (città, paese, continente)
         const persons = await db_mongo.collection('IsLocatedInPlace').find({
-            placeId: { $in: locationIds }
+            placePath: place.id
         }).toArray();
 
         if (persons.length === 0) {
@@ -145,22 +105,9 @@ router.get('/queryLookUp3', async (req, res) => {
             return res.status(400).json({ error: 'Language is required' });
         }
 
+        // forumId è incorporato nei post al caricamento: una sola distinct sull'indice language + forumId
         const db_mongo = getMongo();
-        const posts = await db_mongo.collection('Post').find(
-            { language }
-        ).project({ id: 1 }).toArray();
-
-        const postIds = posts.map(post => post.id);
-
-        if (postIds.length === 0) {
-            return res.json({ message: 'No posts found in this language', forums: [] });
-        }
-
-        const forumPostRelations = await db_mongo.collection('ForumContainerPost').find(
-            { postId: { $in: postIds } }
-        ).toArray();
-
-        const forumIds = [...new Set(forumPostRelations.map(relation => relation.forumId))];
+        const forumIds = await db_mongo.collection('Post').distinct('forumId', { language });
 
         if (forumIds.length === 0) {
             return res.json({ message: 'No forums found containing posts in this language', forums: [] });
@@ -191,12 +138,11 @@ router.get('/queryAnalitica1', async (req, res) => {
     try {
         const session = getNeo4J();
 
+        // coLikeCount è precalcolato da population_neo4j.py (MATERIALIZATIONS)
         const result = await session.run(
-            `MATCH (creator:Person)-[:HAS_CREATOR_POST]-(post:Post)-[:LIKES_POST]-(liker:Person),
-                          (creator)-[:STUDY_AT]-(university:University),
-                          (liker)-[:STUDY_AT]-(university)
-                    WITH university.id AS universityId, count(liker) AS likeCount
-                    RETURN universityId, likeCount
+            `MATCH (university:University)
+                    WHERE university.coLikeCount > 0
+                    RETURN university.id AS universityId, university.coLikeCount AS likeCount
                     ORDER BY likeCount DESC`
         );
 
@@ -228,43 +174,23 @@ router.get('/queryAnalitica2', async (req, res) => {
     try {
         const session = getNeo4J();
 
+        // Età media dei conosciuti precalcolata per ogni moderatore (avgKnownAge, knownCount)
         const result = await session.run(
             'MATCH (forum:Forum)-[r:MODERATOR]->(person:Person) ' +
-            'RETURN DISTINCT person.firstName AS name, person.id AS id'
+            'RETURN DISTINCT person.firstName AS name, person.id AS id, ' +
+            'person.avgKnownAge AS avgAge, person.knownCount AS knownCount'
         );
 
-        const mods = result.records.map(record => ({
-            name: record.get('name'),
-            id: record.get('id').toString()
-        }));
-
-        // Calcola l'età media per ogni moderatore
-        for (const mod of mods) {
-            try {
-                const avgAgeResult = await session.run(
-                    `MATCH (person:Person {id: $idMod})-[:KNOWS]->(knownPerson:Person)
-                 WHERE knownPerson.birthday IS NOT NULL
-                 WITH person, knownPerson,
-                      duration.between(datetime(knownPerson.birthday), datetime()).years AS knownPersonAge
-                 RETURN AVG(knownPersonAge) AS AverageAgeOfKnownPeople,
-                       COUNT(knownPerson) AS NumberOfKnownPeople`,
-                    { idMod: parseInt(mod.id) }
-                );
-
-                if (avgAgeResult.records.length > 0) {
-                    const avgAge = avgAgeResult.records[0].get('AverageAgeOfKnownPeople');
-                    mod.averageAgeOfKnownPeople = avgAge !== null ? parseFloat(avgAge).toFixed(1) : 'No data';
-                    mod.numberOfKnownPeople = avgAgeResult.records[0].get('NumberOfKnownPeople').toInt();
-                } else {
-                    mod.averageAgeOfKnownPeople = 'No data';
-                    mod.numberOfKnownPeople = 0;
-                }
-            } catch (avgErr) {
-                console.error(`Error calculating average age for moderator ${mod.name}:`, avgErr);
-                mod.averageAgeOfKnownPeople = 'Error';
-                mod.numberOfKnownPeople = 0;
-            }
-        }
+        const mods = result.records.map(record => {
+            const avgAge = record.get('avgAge');
+            const knownCount = record.get('knownCount');
+            return {
+                name: record.get('name'),
+                id: record.get('id').toString(),
+                averageAgeOfKnownPeople: avgAge !== null ? parseFloat(avgAge).toFixed(1) : 'No data',
+                numberOfKnownPeople: knownCount !== null ? knownCount.toInt() : 0
+            };
+        });
 
         await session.close();
         res.json({ mods });
@@ -279,21 +205,12 @@ router.get('/queryAnalitica3', async (req, res) => {
     try {
         const session = getNeo4J();
 
+        // Genere prevalente per tag precalcolato (dominantGender, dominanceRatio, genderCount)
         const result = await session.run(
-            `MATCH (person:Person)-[:INTEREST]->(tag:Tag)
-                    WHERE person.gender IS NOT NULL
-                    WITH tag.name AS tagName, person.gender AS gender, COUNT(person) AS count
-                    WITH tagName, gender, count
-                    ORDER BY tagName, count DESC
-                    WITH tagName, COLLECT({gender: gender, count: count}) AS genderCounts,
-                         SUM(count) AS totalCount
-                    WITH tagName, 
-                         genderCounts[0].gender AS mostCommonGender,
-                         genderCounts[0].count AS count,
-                         toFloat(genderCounts[0].count) / totalCount AS dominanceRatio,
-                         size(genderCounts) AS numberOfGenders
-                    WHERE numberOfGenders > 1
-                    RETURN tagName, mostCommonGender, count, dominanceRatio
+            `MATCH (tag:Tag)
+                    WHERE tag.genderCount > 1
+                    RETURN tag.name AS tagName, tag.dominantGender AS mostCommonGender,
+                           tag.dominantGenderCount AS count, tag.dominanceRatio AS dominanceRatio
                     ORDER BY count DESC`
         );
 
@@ -0,0 +1,74 @@
+"""Micro-benchmark: BSON encoding of a collection, full dict list vs per-batch raw documents.
+
+Usage: python benchmarks/bench_bson_encoding.py [--rows N]
+
+The dict path builds every document first and encodes one batch at a time, as
+pymongo does inside insert_many; the raw path encodes each batch straight into
+RawBSONDocument buffers. Peak memory is the Python heap measured by tracemalloc.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from bson import encode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from population_mongo import BATCH_SIZE, dict_batches, raw_batches
+
+
+def synthetic_comments(rows, seed=42):
+    """Comment-like table with typed columns, as read by ldbc_csv"""
+    rng = np.random.default_rng(seed)
+    lengths = pd.array(rng.integers(1, 200, rows), dtype="Int64")
+    lengths[rng.random(rows) < 0.05] = pd.NA
+    return pd.DataFrame({
+        "id": rng.integers(0, 10_000_000_000, rows, dtype="int64"),
+        "creationDate": pd.to_datetime(rng.integers(1262304000, 1356998400, rows), unit="s", utc=True),
+        "locationIP": [f"10.0.{i % 256}.{i % 251}" for i in range(rows)],
+        "browserUsed": pd.Categorical(rng.choice(["Firefox", "Chrome", "Safari", "Opera"], rows)),
+        "content": [f"comment text number {i}" for i in range(rows)],
+        "length": lengths,
+    })
+
+
+def encode_dicts(df, batch_size):
+    total = 0
+    for batch in dict_batches(df, batch_size):
+        # pymongo encodes each document of the batch when sending it
+        total += sum(len(encode(document)) > 0 for document in batch)
+    return total
+
+
+def encode_raw(df, batch_size):
+    return sum(len(batch) for batch in raw_batches(df, batch_size))
+
+
+def measure(func, df, batch_size):
+    tracemalloc.start()
+    start = time.perf_counter()
+    total = func(df, batch_size)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    df = synthetic_comments(args.rows)
+    for name, func in (("dicts", encode_dicts), ("raw", encode_raw)):
+        total, elapsed, peak = measure(func, df, args.batch_size)
+        print(f"{name:>5}: {total} documents in {elapsed:.2f} s ({total / elapsed:,.0f} docs/s), "
+              f"peak heap {peak / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""Loader benchmark: population_neo4j and population_mongo stages on generated LDBC data.
+
+Usage: python benchmarks/bench_loaders.py [--scale-factor SF] [--loader neo4j|mongo|both]
+                                          [--target stub|server] [--save FILE] [--baseline FILE]
+
+The data is written by generate_ldbc.py into --data, and regenerated only when the
+scale factor or seed change. With --target stub (the default) the drivers are
+in-process stand-ins that record every write and answer with the counters a server
+would return, so the timings are the client cost alone: parsing, batching, document
+encoding and the loaders' bookkeeping. Neo4j parameter packing is not measured; Mongo
+documents are BSON-encoded as pymongo would. With --target server the stages run
+against the servers configured in the two scripts. Mongo loads into the separate
+--mongo-db database; the loader writes to the default Neo4j database, which the
+benchmark clears first, so the Neo4j server run also needs --wipe-neo4j.
+
+Every stage reports rows, time, rows/s and peak RSS. --save stores the report as JSON;
+--baseline compares the rows/s of each stage with a saved report and exits with status 1
+when a stage is slower than the baseline by more than --tolerance.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from bson import encode
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ldbc_csv
+import population_mongo
+import population_neo4j
+from generate_ldbc import generate, is_generated
+from load_metrics import SERVER_COUNTERS, LoadMetrics, reset_peak_rss
+
+# Stages shorter than this are too noisy to compare with the baseline
+MIN_COMPARED_SECONDS = 0.05
+
+
+class WriteRecorder:
+    """Queries and rows received by the stand-in drivers"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, rows, size=0):
+        with self._lock:
+            self.queries += 1
+            self.rows += rows
+            self.bytes += size
+
+
+class StubNeo4jResult:
+    """Result of a recorded query, with the counters the server would report"""
+
+    def __init__(self, query, parameters):
+        rows = len(parameters.get("batch") or ())
+        counters = dict.fromkeys(SERVER_COUNTERS, 0)
+        if "CREATE" in query or "MERGE" in query:
+            counters["relationships_created" if "-[" in query else "nodes_created"] = rows
+        self.counters = SimpleNamespace(**counters)
+
+    def consume(self):
+        return self
+
+    def single(self):
+        return None
+
+    def data(self):
+        return []
+
+    def value(self):
+        return []
+
+
+class StubNeo4jSession:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, query, parameters=None, **kwargs):
+        parameters = {**(parameters or {}), **kwargs}
+        self.recorder.record(len(parameters.get("batch") or ()))
+        return StubNeo4jResult(query, parameters)
+
+    def execute_write(self, work, *args, **kwargs):
+        return work(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+
+class StubNeo4jDriver:
+    """Stand-in for the sync Neo4j driver"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def session(self, **config):
+        return StubNeo4jSession(self.recorder)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StubAsyncNeo4jResult:
+    def __init__(self, result):
+        self.result = result
+
+    async def consume(self):
+        return self.result
+
+
+class StubAsyncNeo4jSession:
+    def __init__(self, recorder):
+        self.session = StubNeo4jSession(recorder)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def run(self, query, parameters=None, **kwargs):
+        # Yield to the loop, as a round trip would
+        await asyncio.sleep(0)
+        return StubAsyncNeo4jResult(self.session.run(query, parameters, **kwargs))
+
+    async def execute_write(self, work, *args, **kwargs):
+        return await work(self, *args, **kwargs)
+
+
+class StubAsyncNeo4jDriver:
+    """Stand-in for the async Neo4j driver"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def session(self, **config):
+        return StubAsyncNeo4jSession(self.recorder)
+
+    async def close(self):
+        pass
+
+
+class StubAsyncLoader(population_neo4j.AsyncLoader):
+    """The async write engine on the stand-in driver"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        super().__init__()
+
+    async def _connect(self, uri, auth):
+        return StubAsyncNeo4jDriver(self.recorder)
+
+
+class StubMongoCollection:
+    """Stand-in for a pymongo collection: encodes each document as pymongo would send it"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def insert_many(self, documents, ordered=True):
+        # RawBSONDocument buffers are sent as they are, dicts are encoded by the driver
+        size = sum(len(document.raw) if isinstance(document, RawBSONDocument) else len(encode(document))
+                   for document in documents)
+        self.recorder.record(len(documents), size)
+        # Like pymongo, only documents that are not RawBSONDocument get an inserted id
+        return SimpleNamespace(inserted_ids=[document.get("_id") for document in documents
+                                             if not isinstance(document, RawBSONDocument)])
+
+    def create_index(self, keys, **kwargs):
+        return "_".join(f"{key}_{direction}" for key, direction in keys)
+
+
+class StubMongoDatabase:
+    """Stand-in for a pymongo database"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, StubMongoCollection(self.recorder))
+
+    def list_collection_names(self):
+        return list(self.collections)
+
+    def create_collection(self, name):
+        return self[name]
+
+    def drop_collection(self, name):
+        self.collections.pop(name, None)
+
+
+def run_neo4j(args, metrics):
+    """Run every population_neo4j stage; returns True if all succeeded"""
+    loader = population_neo4j
+    loader.METRICS = metrics
+    loader.WORKERS = args.workers
+    loader.BATCH_SIZE = args.batch_size
+    # Fixed sizes, so runs are comparable and no batch_sizes.json is written
+    loader.ADAPTIVE_BATCHES = False
+    loader.LEARNED_BATCH_SIZES = {}
+    loader.STREAMING = args.stream
+    loader.NODE_ID_INDEX = {}
+
+    recorder = WriteRecorder()
+    if args.target == "stub":
+        driver = StubNeo4jDriver(recorder)
+    else:
+        driver = loader.connect_to_db()
+        if not driver:
+            return False
+    if args.backend == "async":
+        loader.ASYNC_LOADER = StubAsyncLoader(recorder) if args.target == "stub" else loader.AsyncLoader()
+
+    try:
+        if args.target == "server":
+            loader.clear_db(driver)
+            loader.create_indices(driver)
+        # With a single running stage, run_stages resets the peak RSS before each one
+        return loader.run_stages(driver, loader.build_stages(), args.stage_concurrency)
+    finally:
+        driver.close()
+        if loader.ASYNC_LOADER is not None:
+            loader.ASYNC_LOADER.close()
+            loader.ASYNC_LOADER = None
+        if args.target == "stub":
+            print(f"neo4j stand-in: {recorder.queries} queries, {recorder.rows} rows")
+
+
+def run_mongo(args, metrics):
+    """Load every population_mongo collection; returns True if all succeeded"""
+    loader = population_mongo
+    recorder = WriteRecorder()
+    client = None
+    if args.target == "stub":
+        db = StubMongoDatabase(recorder)
+    else:
+        client = MongoClient(loader.MONGO_URI, maxPoolSize=max(args.workers, 1) * 2)
+        client.drop_database(args.mongo_db)
+        db = client[args.mongo_db]
+
+    try:
+        transforms = loader.combine_transforms(loader.place_hierarchy_transforms(loader.place_ancestry()),
+                                               loader.relation_transforms())
+        succeeded = True
+        for collection_name, filename in loader.csv_files.items():
+            reset_peak_rss()
+            rows = loader.load_collection(db, collection_name, filename, args.workers > 1, args.batch_size,
+                                          args.workers, transforms.get(collection_name), metrics, args.encoding)
+            succeeded = succeeded and rows is not None
+        if client is not None:
+            loader.build_indexes(db)
+        return succeeded
+    finally:
+        if client is not None:
+            client.close()
+        else:
+            print(f"mongo stand-in: {recorder.queries} insert_many calls, {recorder.rows} documents, "
+                  f"{recorder.bytes / 1024 / 1024:.1f} MB of BSON")
+
+
+def print_report(report):
+    print(f"\n{report['loader']}: {report['wall_seconds']:.2f} s, peak RSS {report['peak_rss_mb']:.1f} MB")
+    print(f"{'stage':<40} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'peak RSS MB':>12}")
+    for stage in report["stages"]:
+        print(f"{stage['stage']:<40} {stage['rows']:>10} {stage['wall_seconds']:>9.3f} "
+              f"{stage['rows_per_second']:>12,.0f} {stage['peak_rss_mb']:>12.1f}")
+
+
+def compare_with_baseline(reports, baseline, tolerance):
+    """Stages whose rows/s fell below the baseline by more than tolerance"""
+    regressions = []
+    for loader, report in reports.items():
+        previous = {stage["stage"]: stage for stage in baseline.get("loaders", {}).get(loader, {}).get("stages", [])}
+        for stage in report["stages"]:
+            before = previous.get(stage["stage"])
+            if not before or before["wall_seconds"] < MIN_COMPARED_SECONDS or not before["rows_per_second"]:
+                continue
+            ratio = stage["rows_per_second"] / before["rows_per_second"]
+            if ratio < 1 - tolerance:
+                regressions.append((loader, stage["stage"], before["rows_per_second"], stage["rows_per_second"], ratio))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale-factor", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data", default="bench_data", help="directory of the generated dataset")
+    parser.add_argument("--loader", choices=["neo4j", "mongo", "both"], default="both")
+    parser.add_argument("--target", choices=["stub", "server"], default="stub")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Neo4j sessions per relationship stage, Mongo insert threads per collection")
+    parser.add_argument("--backend", choices=["sync", "async"], default="sync")
+    parser.add_argument("--stage-concurrency", type=int, default=1,
+                        help="concurrent Neo4j stages; with more than 1 the peak RSS is the process one")
+    parser.add_argument("--stream", action="store_true", help="stream the Neo4j input files in chunks")
+    parser.add_argument("--encoding", choices=["raw", "dicts"], default=population_mongo.ENCODING)
+    parser.add_argument("--cache", action="store_true",
+                        help="use the parse cache, which is warm after the first run")
+    parser.add_argument("--mongo-db", default="MAADB_bench", help="database loaded with --target server")
+    parser.add_argument("--wipe-neo4j", action="store_true",
+                        help="allow --target server to clear the Neo4j database the loader writes to")
+    parser.add_argument("--save", metavar="FILE", help="write the report as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="report saved by an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="largest accepted drop in rows/s against the baseline")
+    parser.add_argument("--verbose", action="store_true", help="keep the loaders' own output")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.target == "server" and args.loader != "mongo" and not args.wipe_neo4j:
+        sys.exit(f"--target server clears the Neo4j database at {population_neo4j.URI}; "
+                 f"pass --wipe-neo4j to confirm, or use --loader mongo")
+
+    if is_generated(args.data, args.scale_factor, args.seed):
+        print(f"Using the SF {args.scale_factor} dataset in '{args.data}'")
+    else:
+        start = time.perf_counter()
+        written = generate(args.data, args.scale_factor, args.seed)
+        print(f"Generated {sum(written.values())} rows of SF {args.scale_factor} in '{args.data}' "
+              f"in {time.perf_counter() - start:.2f} s")
+
+    # Both loaders read test/... relative to the working directory
+    save, baseline = (os.path.abspath(path) if path else None for path in (args.save, args.baseline))
+    os.chdir(args.data)
+    # Without the cache every run parses the CSV files, so runs are comparable
+    ldbc_csv.CACHE_DIR = ldbc_csv.CACHE_DIR if args.cache else None
+    if not args.verbose:
+        logging.getLogger(population_neo4j.__name__).setLevel(logging.WARNING)
+
+    parameters = {"scale_factor": args.scale_factor, "target": args.target, "batch_size": args.batch_size,
+                  "workers": args.workers, "backend": args.backend, "encoding": args.encoding,
+                  "stream": args.stream, "cache": args.cache}
+    runners = {"neo4j": run_neo4j, "mongo": run_mongo}
+    loaders = list(runners) if args.loader == "both" else [args.loader]
+    reports = {}
+    failed = []
+    for loader in loaders:
+        metrics = LoadMetrics(loader, parameters)
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            succeeded = runners[loader](args, metrics)
+        if not succeeded:
+            failed.append(loader)
+        reports[loader] = metrics.report()
+        print_report(reports[loader])
+
+    if save:
+        with open(save, "w") as f:
+            json.dump({"parameters": parameters, "loaders": reports}, f, indent=2)
+        print(f"\nReport written to '{args.save}'")
+
+    status = 0
+    if failed:
+        print(f"\nFailed loaders: {', '.join(failed)} (run with --verbose for details)")
+        status = 1
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare_with_baseline(reports, json.load(f), args.tolerance)
+        for loader, stage, before, after, ratio in regressions:
+            print(f"Regression: {loader} {stage} {before:,.0f} -> {after:,.0f} rows/s ({ratio:.0%} of baseline)")
+        if regressions:
+            status = 1
+        else:
+            print(f"No stage slower than the baseline by more than {args.tolerance:.0%}")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
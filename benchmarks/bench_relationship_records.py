@@ -0,0 +1,82 @@
+"""Micro-benchmark: relationship record building, iterrows loop vs column-wise path.
+
+Usage: python benchmarks/bench_relationship_records.py [--rows N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from population_neo4j import BATCH_SIZE, batch_process, build_relationship_records
+
+
+def iterrows_records(batch, start_id_field, end_id_field, props=None):
+    """Previous per-row implementation, kept as the baseline.
+
+    Missing values are now NaT rather than "", and timestamps are sent as native
+    datetimes, so the loop checks and converts them as the columnar path does.
+    """
+    records = []
+    for _, row in batch.iterrows():
+        record = {
+            'start_id': int(row[start_id_field]),
+            'end_id': int(row[end_id_field])
+        }
+        if props:
+            for prop, field in props.items():
+                if field in row and pd.notna(row[field]):
+                    value = row[field]
+                    record[prop] = value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+        records.append(record)
+    return records
+
+
+def synthetic_edges(rows, seed=42):
+    """Person-likes-post style edge table with a sparse date property, typed as ldbc_csv reads it"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Series(pd.to_datetime(rng.integers(1262304000, 1356998400, rows), unit='s', utc=True))
+    dates[rng.random(rows) < 0.1] = pd.NaT
+    return pd.DataFrame({
+        'Person.id': rng.integers(0, 10_000_000, rows, dtype='int64'),
+        'Post.id': rng.integers(0, 100_000_000, rows, dtype='int64'),
+        'creationDate': dates
+    })
+
+
+def without_nulls(records):
+    """Records with null properties left out: SET skips them, as if they were absent"""
+    return [{key: value for key, value in record.items() if value is not None} for record in records]
+
+
+def run(builder, data, props):
+    start = time.perf_counter()
+    total = 0
+    for batch in batch_process(data, BATCH_SIZE):
+        total += len(builder(batch, 'Person.id', 'Post.id', props))
+    return total, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    data = synthetic_edges(args.rows)
+    props = {"creationDate": "creationDate"}
+
+    # Both builders must send the same payload, or the comparison is meaningless
+    sample = data.iloc[:BATCH_SIZE]
+    assert (without_nulls(build_relationship_records(sample, 'Person.id', 'Post.id', props))
+            == iterrows_records(sample, 'Person.id', 'Post.id', props)), "builders produce different records"
+
+    for name, builder in (("iterrows", iterrows_records), ("columnar", build_relationship_records)):
+        total, elapsed = run(builder, data, props)
+        print(f"{name:>9}: {total} records in {elapsed:.2f} s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Synthetic LDBC SNB data in the datagen CsvBasic layout read by both loaders.
+
+Usage: python benchmarks/generate_ldbc.py [--scale-factor SF] [--output DIR] [--seed N]
+
+Writes DIR/test/static and DIR/test/dynamic with the pipe-delimited files and headers
+that population_mongo.py and population_neo4j.py expect, so the loaders can run from
+DIR. Dynamic entities scale with the scale factor (about 10000 people at SF 1, with
+LDBC-like degrees); the static tables (places, tags, organisations) keep their SF 1
+size, as in datagen. The same scale factor and seed always give the same files.
+"""
+import argparse
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Version of the generated layout, stored in the marker file
+GENERATOR_VERSION = 1
+# Marker written next to the data with the parameters that produced it
+MARKER_FILE = "generate_ldbc.json"
+
+# People per unit of scale factor
+PERSONS_PER_SF = 10_000
+
+# Static tables, sized as in the SF 1 datagen output
+CONTINENTS = 6
+COUNTRIES = 111
+CITIES = 1343
+TAG_CLASSES = 71
+TAGS = 16080
+UNIVERSITIES = 6380
+COMPANIES = 1575
+
+# Average degrees of the dynamic entities
+KNOWS_PER_PERSON = 18
+INTERESTS_PER_PERSON = 23
+STUDY_AT_RATIO = 0.8
+WORK_AT_PER_PERSON = 2.1
+FORUMS_PER_PERSON = 9
+MEMBERS_PER_FORUM = 18
+TAGS_PER_FORUM = 3
+POSTS_PER_PERSON = 100
+COMMENTS_PER_PERSON = 200
+TAGS_PER_POST = 0.75
+TAGS_PER_COMMENT = 1.3
+LIKES_PER_POST = 0.75
+LIKES_PER_COMMENT = 0.7
+COMMENT_REPLY_RATIO = 0.5
+PHOTO_RATIO = 0.3
+
+# Timestamps of the simulated network
+START_DATE = np.datetime64("2010-01-01T00:00:00.000")
+END_DATE = np.datetime64("2013-01-01T00:00:00.000")
+
+FIRST_NAMES = ["Mahinda", "Carmen", "Hans", "Jun", "Ali", "Anna", "Luca", "Chen", "Maria", "John",
+               "Fatima", "Ivan", "Aiko", "Pedro", "Sara", "Omar", "Elena", "Raj", "Nina", "Karl"]
+LAST_NAMES = ["Perera", "Lepland", "Johansson", "Wang", "Khan", "Rossi", "Garcia", "Smith",
+              "Kumar", "Ivanov", "Tanaka", "Silva", "Muller", "Nguyen", "Haddad", "Costa"]
+BROWSERS = ["Firefox", "Chrome", "Internet Explorer", "Safari", "Opera"]
+LANGUAGES = ["en", "es", "zh", "de", "fr", "it", "pt", "ru", "ar", "uz", "tk", "ta"]
+SENTENCES = ["About the history of this place, a short note.",
+             "Thanks, good to know.",
+             "I agree with what you wrote about the match yesterday.",
+             "Nice photo!",
+             "Does anybody know where the next concert will take place?",
+             "ok",
+             "This album brings back memories of the summer we spent travelling.",
+             "No way, that is not what happened at all."]
+
+
+def rng_for(seed, name):
+    """Random generator of one table, independent of the order the tables are written in"""
+    return np.random.default_rng([seed, zlib.crc32(name.encode())])
+
+
+def labels(prefix, count):
+    return np.char.add(prefix, np.arange(count).astype(str))
+
+
+def timestamps(rng, count, start=START_DATE, end=END_DATE):
+    """creationDate-style strings, e.g. 2010-02-14T15:32:10.447+0000"""
+    span = int((end - start) / np.timedelta64(1, "ms"))
+    values = start + rng.integers(0, span, count).astype("timedelta64[ms]")
+    return np.char.add(np.datetime_as_string(values, unit="ms"), "+0000")
+
+
+def dates(rng, count, start="1980-01-01", end="1991-01-01"):
+    """birthday-style strings, e.g. 1989-12-03"""
+    start = np.datetime64(start, "D")
+    span = int((np.datetime64(end, "D") - start) / np.timedelta64(1, "D"))
+    return np.datetime_as_string(start + rng.integers(0, span, count).astype("timedelta64[D]"))
+
+
+def ip_addresses(rng, count, pool=1000):
+    addresses = np.array([".".join(map(str, octets)) for octets in rng.integers(1, 255, (pool, 4))])
+    return addresses[rng.integers(0, pool, count)]
+
+
+def unique_pairs(start, end, distinct=False):
+    """Pairs without duplicates, sorted by start id; distinct drops self pairs"""
+    pairs = np.stack([start, end], axis=1)
+    if distinct:
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    pairs = np.unique(pairs, axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def write_table(root, filename, header, columns):
+    """Write one pipe-delimited file with the given header; returns its row count"""
+    path = os.path.join(root, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Positional columns, since relationship headers repeat names (Person.id|Person.id)
+    frame = pd.DataFrame({position: column for position, column in enumerate(columns)})
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("|".join(header) + "\n")
+        frame.to_csv(f, sep="|", header=False, index=False, lineterminator="\n")
+    return len(frame)
+
+
+def generate(root, scale_factor=0.1, seed=42):
+    """Write the whole dataset under root; returns the row count of each file"""
+    written = {}
+
+    def table(filename, header, columns):
+        written[filename] = write_table(root, filename, header, columns)
+
+    # Places: continents, then countries, then cities, each part of the level above
+    rng = rng_for(seed, "place")
+    place_ids = np.arange(CONTINENTS + COUNTRIES + CITIES)
+    continents = place_ids[:CONTINENTS]
+    countries = place_ids[CONTINENTS:CONTINENTS + COUNTRIES]
+    cities = place_ids[CONTINENTS + COUNTRIES:]
+    place_names = np.concatenate([labels("Continent_", CONTINENTS), labels("Country_", COUNTRIES),
+                                  labels("City_", CITIES)])
+    place_types = np.repeat(["continent", "country", "city"], [CONTINENTS, COUNTRIES, CITIES])
+    table("test/static/place_0_0.csv", ["id", "name", "url", "type"],
+          [place_ids, place_names, np.char.add("http://dbpedia.org/resource/", place_names), place_types])
+    table("test/static/place_isPartOf_place_0_0.csv", ["Place.id", "Place.id"],
+          [np.concatenate([countries, cities]),
+           np.concatenate([rng.choice(continents, COUNTRIES), rng.choice(countries, CITIES)])])
+
+    # Tag classes form a tree rooted at class 0, every tag has one class
+    rng = rng_for(seed, "tag")
+    tagclass_names = labels("TagClass_", TAG_CLASSES)
+    table("test/static/tagclass_0_0.csv", ["id", "name", "url"],
+          [np.arange(TAG_CLASSES), tagclass_names, np.char.add("http://dbpedia.org/ontology/", tagclass_names)])
+    subclasses = np.arange(1, TAG_CLASSES)
+    table("test/static/tagclass_isSubclassOf_tagclass_0_0.csv", ["TagClass.id", "TagClass.id"],
+          [subclasses, (rng.random(len(subclasses)) * subclasses).astype(np.int64)])
+    tag_names = labels("Tag_", TAGS)
+    table("test/static/tag_0_0.csv", ["id", "name", "url"],
+          [np.arange(TAGS), tag_names, np.char.add("http://dbpedia.org/resource/", tag_names)])
+    table("test/static/tag_hasType_tagclass_0_0.csv", ["Tag.id", "TagClass.id"],
+          [np.arange(TAGS), rng.integers(0, TAG_CLASSES, TAGS)])
+
+    # Organisations: universities first, then companies
+    universities = np.arange(UNIVERSITIES)
+    companies = np.arange(UNIVERSITIES, UNIVERSITIES + COMPANIES)
+    organisation_names = np.concatenate([labels("University_", UNIVERSITIES), labels("Company_", COMPANIES)])
+    table("test/static/organisation_0_0.csv", ["id", "type", "name", "url"],
+          [np.concatenate([universities, companies]),
+           np.repeat(["university", "company"], [UNIVERSITIES, COMPANIES]),
+           organisation_names, np.char.add("http://dbpedia.org/resource/", organisation_names)])
+
+    # People
+    persons = max(int(PERSONS_PER_SF * scale_factor), 10)
+    rng = rng_for(seed, "person")
+    table("test/dynamic/person_0_0.csv",
+          ["id", "firstName", "lastName", "gender", "birthday", "creationDate", "locationIP", "browserUsed"],
+          [np.arange(persons), rng.choice(FIRST_NAMES, persons), rng.choice(LAST_NAMES, persons),
+           rng.choice(["male", "female"], persons), dates(rng, persons), timestamps(rng, persons),
+           ip_addresses(rng, persons), rng.choice(BROWSERS, persons)])
+    table("test/dynamic/person_isLocatedIn_place_0_0.csv", ["Person.id", "Place.id"],
+          [np.arange(persons), rng.choice(cities, persons)])
+
+    rng = rng_for(seed, "person_knows_person")
+    count = persons * KNOWS_PER_PERSON // 2
+    start, end = unique_pairs(rng.integers(0, persons, count), rng.integers(0, persons, count), distinct=True)
+    table("test/dynamic/person_knows_person_0_0.csv", ["Person.id", "Person.id", "creationDate"],
+          [start, end, timestamps(rng, len(start))])
+
+    rng = rng_for(seed, "person_hasInterest_tag")
+    count = persons * INTERESTS_PER_PERSON
+    start, end = unique_pairs(rng.integers(0, persons, count), rng.integers(0, TAGS, count))
+    table("test/dynamic/person_hasInterest_tag_0_0.csv", ["Person.id", "Tag.id"], [start, end])
+
+    rng = rng_for(seed, "person_studyAt_organisation")
+    students = np.flatnonzero(rng.random(persons) < STUDY_AT_RATIO)
+    table("test/dynamic/person_studyAt_organisation_0_0.csv", ["Person.id", "Organisation.id", "classYear"],
+          [students, rng.choice(universities, len(students)), rng.integers(2000, 2013, len(students))])
+
+    rng = rng_for(seed, "person_workAt_organisation")
+    count = int(persons * WORK_AT_PER_PERSON)
+    start, end = unique_pairs(rng.integers(0, persons, count), rng.choice(companies, count))
+    table("test/dynamic/person_workAt_organisation_0_0.csv", ["Person.id", "Organisation.id", "workFrom"],
+          [start, end, rng.integers(1998, 2013, len(start))])
+
+    # Forums, each with a moderator, members and tags
+    forums = persons * FORUMS_PER_PERSON
+    rng = rng_for(seed, "forum")
+    table("test/dynamic/forum_0_0.csv", ["id", "title", "creationDate"],
+          [np.arange(forums), labels("Group for ", forums), timestamps(rng, forums)])
+    table("test/dynamic/forum_hasModerator_person_0_0.csv", ["Forum.id", "Person.id"],
+          [np.arange(forums), rng.integers(0, persons, forums)])
+
+    rng = rng_for(seed, "forum_hasMember_person")
+    count = forums * MEMBERS_PER_FORUM
+    start, end = unique_pairs(rng.integers(0, forums, count), rng.integers(0, persons, count))
+    table("test/dynamic/forum_hasMember_person_0_0.csv", ["Forum.id", "Person.id", "joinDate"],
+          [start, end, timestamps(rng, len(start))])
+
+    rng = rng_for(seed, "forum_hasTag_tag")
+    count = forums * TAGS_PER_FORUM
+    start, end = unique_pairs(rng.integers(0, forums, count), rng.integers(0, TAGS, count))
+    table("test/dynamic/forum_hasTag_tag_0_0.csv", ["Forum.id", "Tag.id"], [start, end])
+
+    # Posts and comments share the message id space, comments after posts
+    posts = persons * POSTS_PER_PERSON
+    comments = persons * COMMENTS_PER_PERSON
+    post_ids = np.arange(posts)
+    comment_ids = np.arange(posts, posts + comments)
+
+    rng = rng_for(seed, "post")
+    # Photos have an image file and no language or content
+    photo = rng.random(posts) < PHOTO_RATIO
+    sentence = rng.integers(0, len(SENTENCES), posts)
+    content = np.where(photo, "", np.array(SENTENCES)[sentence])
+    table("test/dynamic/post_0_0.csv",
+          ["id", "imageFile", "creationDate", "locationIP", "browserUsed", "language", "content", "length"],
+          [post_ids, np.where(photo, np.char.add(np.char.add("photo", post_ids.astype(str)), ".jpg"), ""),
+           timestamps(rng, posts), ip_addresses(rng, posts), rng.choice(BROWSERS, posts),
+           np.where(photo, "", rng.choice(LANGUAGES, posts)), content, np.char.str_len(content)])
+    table("test/dynamic/post_hasCreator_person_0_0.csv", ["Post.id", "Person.id"],
+          [post_ids, rng.integers(0, persons, posts)])
+    table("test/dynamic/forum_containerOf_post_0_0.csv", ["Forum.id", "Post.id"],
+          [rng.integers(0, forums, posts), post_ids])
+
+    rng = rng_for(seed, "post_hasTag_tag")
+    count = int(posts * TAGS_PER_POST)
+    start, end = unique_pairs(rng.choice(post_ids, count), rng.integers(0, TAGS, count))
+    table("test/dynamic/post_hasTag_tag_0_0.csv", ["Post.id", "Tag.id"], [start, end])
+
+    rng = rng_for(seed, "comment")
+    content = np.array(SENTENCES)[rng.integers(0, len(SENTENCES), comments)]
+    table("test/dynamic/comment_0_0.csv", ["id", "creationDate", "locationIP", "browserUsed", "content", "length"],
+          [comment_ids, timestamps(rng, comments), ip_addresses(rng, comments), rng.choice(BROWSERS, comments),
+           content, np.char.str_len(content)])
+    table("test/dynamic/comment_hasCreator_person_0_0.csv", ["Comment.id", "Person.id"],
+          [comment_ids, rng.integers(0, persons, comments)])
+    # Replies point at an earlier comment
+    replies = np.flatnonzero(rng.random(comments) < COMMENT_REPLY_RATIO)
+    replies = replies[replies > 0]
+    table("test/dynamic/comment_replyOf_comment_0_0.csv", ["Comment.id", "Comment.id"],
+          [comment_ids[replies], comment_ids[(rng.random(len(replies)) * replies).astype(np.int64)]])
+
+    rng = rng_for(seed, "comment_hasTag_tag")
+    count = int(comments * TAGS_PER_COMMENT)
+    start, end = unique_pairs(rng.choice(comment_ids, count), rng.integers(0, TAGS, count))
+    table("test/dynamic/comment_hasTag_tag_0_0.csv", ["Comment.id", "Tag.id"], [start, end])
+
+    # Likes
+    rng = rng_for(seed, "person_likes_post")
+    count = int(posts * LIKES_PER_POST)
+    start, end = unique_pairs(rng.integers(0, persons, count), rng.choice(post_ids, count))
+    table("test/dynamic/person_likes_post_0_0.csv", ["Person.id", "Post.id", "creationDate"],
+          [start, end, timestamps(rng, len(start))])
+
+    rng = rng_for(seed, "person_likes_comment")
+    count = int(comments * LIKES_PER_COMMENT)
+    start, end = unique_pairs(rng.integers(0, persons, count), rng.choice(comment_ids, count))
+    table("test/dynamic/person_likes_comment_0_0.csv", ["Person.id", "Comment.id", "creationDate"],
+          [start, end, timestamps(rng, len(start))])
+
+    with open(os.path.join(root, MARKER_FILE), "w") as f:
+        json.dump({"scale_factor": scale_factor, "seed": seed, "version": GENERATOR_VERSION,
+                   "files": written}, f, indent=2)
+    return written
+
+
+def is_generated(root, scale_factor, seed):
+    """True if root already holds the data of this scale factor and seed"""
+    try:
+        with open(os.path.join(root, MARKER_FILE)) as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (marker.get("scale_factor") == scale_factor and marker.get("seed") == seed
+            and marker.get("version") == GENERATOR_VERSION
+            and all(os.path.exists(os.path.join(root, filename)) for filename in marker.get("files", {})))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale-factor", type=float, default=0.1)
+    parser.add_argument("--output", default="bench_data")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = generate(args.output, args.scale_factor, args.seed)
+    for filename, rows in written.items():
+        print(f"{rows:>10} {filename}")
+    print(f"{sum(written.values())} rows in {len(written)} files written to '{args.output}' "
+          f"in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
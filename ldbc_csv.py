@@ -0,0 +1,283 @@
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# Columnar parse cache, only available with pyarrow installed
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+# Directory of the parse cache, None disables it
+CACHE_DIR = ".ldbc_cache"
+# Bump when the column types below change, so old cache entries are not reused
+CACHE_VERSION = 1
+
+# Column types of the LDBC CSV files, shared by population_mongo.py and population_neo4j.py.
+# Id columns (id, Person.id, Person.id.1, ...) are always int64.
+
+# Timestamps, parsed as timezone-aware datetimes
+DATETIME_COLUMNS = {"creationDate", "joinDate"}
+# Calendar dates, parsed as naive datetimes at midnight
+DATE_COLUMNS = {"birthday"}
+# Low-cardinality text columns
+CATEGORY_COLUMNS = {"gender", "browserUsed", "language", "type"}
+# Integers that may be missing, kept as nullable Int64 instead of widening to float
+NULLABLE_INT_COLUMNS = {"length", "workFrom", "classYear"}
+
+# Datagen splits large files into <name>_<thread>_<part>.csv parts, optionally compressed
+PART_SUFFIX = re.compile(r"_\d+_\d+\.csv(\.gz|\.zst)?$")
+# Preferred extension when the same part exists more than once
+PART_EXTENSIONS = ("", ".gz", ".zst")
+
+
+def is_id_column(name):
+    """True for id columns, including the .id.1 duplicates pandas creates for self relationships"""
+    return name == "id" or name.endswith(".id") or name.endswith(".id.1")
+
+
+def column_dtypes(columns):
+    """read_csv dtypes for the given header"""
+    dtypes = {}
+    for name in columns:
+        if is_id_column(name):
+            dtypes[name] = "int64"
+        elif name in CATEGORY_COLUMNS:
+            dtypes[name] = "category"
+        elif name in NULLABLE_INT_COLUMNS:
+            dtypes[name] = "Int64"
+    return dtypes
+
+
+def parse_temporal_columns(df):
+    """Convert the date and datetime columns of a frame to native datetimes"""
+    for col in df.columns:
+        if col in DATETIME_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601", utc=True)
+        elif col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+    return df
+
+
+def input_parts(path):
+    """All parts of an LDBC file, in order, given the path of any one of them.
+
+    person_0_0.csv also finds person_0_1.csv, person_1_0.csv.gz, ... but not
+    person_knows_person_0_0.csv. Returns [] when no part exists.
+    """
+    directory, filename = os.path.split(path)
+    suffix = PART_SUFFIX.search(filename)
+    if suffix is None:
+        return [path] if os.path.exists(path) else []
+
+    pattern = re.compile(rf"^{re.escape(filename[:suffix.start()])}_(\d+)_(\d+)\.csv(\.gz|\.zst)?$")
+    try:
+        names = os.listdir(directory or ".")
+    except OSError:
+        return []
+    parts = {}
+    for name in names:
+        match = pattern.match(name)
+        if match is None:
+            continue
+        key = (int(match[1]), int(match[2]))
+        rank = PART_EXTENSIONS.index(match[3] or "")
+        if key not in parts or rank < parts[key][0]:
+            parts[key] = (rank, os.path.join(directory, name))
+    return [parts[key][1] for key in sorted(parts)]
+
+
+def cache_source(path):
+    """Identity of a source file for the cache: absolute path, size and mtime"""
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns, "version": CACHE_VERSION}
+
+
+def cache_file(path):
+    """Cache entry of a source file; it changes whenever the file does"""
+    source = cache_source(path)
+    path_key = hashlib.sha1(source["source"].encode()).hexdigest()[:16]
+    content_key = hashlib.sha1(json.dumps(source, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{path_key}-{content_key}.arrow")
+
+
+def cache_enabled():
+    return CACHE_DIR is not None and pa is not None
+
+
+def write_cache(path, df):
+    """Store a parsed table as an uncompressed Arrow IPC (feather) file, replacing older entries"""
+    target = cache_file(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Older entries of the same file are stale
+    prefix = os.path.basename(target).split("-")[0] + "-"
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(prefix) and name.endswith(".arrow") and name != os.path.basename(target):
+            os.remove(os.path.join(CACHE_DIR, name))
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**table.schema.metadata, b"ldbc_source": json.dumps(cache_source(path)).encode()}
+    tmp = f"{target}.{os.getpid()}-{threading.get_ident()}.tmp"
+    # Uncompressed, so later runs can memory-map it
+    feather.write_feather(table.replace_schema_metadata(metadata), tmp, compression="uncompressed")
+    os.replace(tmp, target)
+
+
+def read_cache(target, usecols=None):
+    """Memory-map a cache entry as an Arrow table"""
+    table = feather.read_table(target, memory_map=True)
+    if usecols is not None:
+        table = table.select([col for col in table.column_names if col in usecols])
+    return table
+
+
+def evict_stale_cache():
+    """Remove cache entries whose source file changed or no longer exists"""
+    if not cache_enabled() or not os.path.isdir(CACHE_DIR):
+        return 0
+    evicted = 0
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".arrow"):
+            continue
+        entry = os.path.join(CACHE_DIR, name)
+        try:
+            metadata = pa.ipc.open_file(pa.memory_map(entry)).schema.metadata or {}
+            source = json.loads(metadata[b"ldbc_source"])
+            stale = cache_source(source["source"]) != source
+        except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+            stale = True
+        if stale:
+            os.remove(entry)
+            evicted += 1
+    return evicted
+
+
+def read_ldbc_csv(path, chunksize=None, usecols=None):
+    """Read a pipe-delimited LDBC file with typed columns, as one table over all its parts.
+
+    Returns a DataFrame, or a generator of DataFrame chunks when chunksize is given.
+    Compressed parts (.csv.gz, .csv.zst) are decompressed while reading. Parsed parts
+    are kept in the cache directory and memory-mapped on later reads.
+    """
+    parts = input_parts(path)
+    if not parts:
+        raise FileNotFoundError(path)
+    if len(parts) == 1:
+        return _read_part(parts[0], chunksize, usecols)
+    if chunksize is not None:
+        return _chain_parts(parts, chunksize, usecols)
+
+    df = pd.concat([_read_part(part, None, usecols) for part in parts], ignore_index=True)
+    # Parts with different categories concatenate to plain string (or object) columns
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def _chain_parts(parts, chunksize, usecols):
+    for part in parts:
+        yield from _read_part(part, chunksize, usecols)
+
+
+def _read_part(path, chunksize=None, usecols=None):
+    if cache_enabled():
+        target = cache_file(path)
+        if os.path.exists(target):
+            table = read_cache(target, usecols)
+            if chunksize is None:
+                return table.to_pandas()
+            return _table_chunks(table, chunksize)
+
+    # Read the header first: pandas renames duplicate columns to Name.id.1
+    header = list(pd.read_csv(path, sep="|", encoding="utf-8", nrows=0).columns)
+    columns = header if usecols is None else [col for col in header if col in usecols]
+    options = dict(sep="|", encoding="utf-8", dtype=column_dtypes(columns), usecols=usecols)
+
+    if chunksize is not None:
+        # Streaming reads stay bounded in memory, so they do not fill the cache
+        return _read_chunks(path, chunksize, options)
+
+    if not cache_enabled():
+        return parse_temporal_columns(pd.read_csv(path, **options))
+
+    # The cache holds every column, so later reads can select any subset
+    df = _parse_file(path, header)
+    write_cache(path, df)
+    return df[columns]
+
+
+def _parse_file(path, header):
+    return parse_temporal_columns(pd.read_csv(path, sep="|", encoding="utf-8", dtype=column_dtypes(header)))
+
+
+def parse_to_cache(path, cache_dir):
+    """Parse a file into the cache, in a worker process; returns the parse time in seconds"""
+    global CACHE_DIR
+    CACHE_DIR = cache_dir
+    start_time = time.time()
+    header = list(pd.read_csv(path, sep="|", encoding="utf-8", nrows=0).columns)
+    write_cache(path, _parse_file(path, header))
+    return time.time() - start_time
+
+
+def prefetch(paths, workers=None):
+    """Parse files, with all their parts, into the cache in a process pool, so the loaders
+    only memory-map them.
+
+    Only the cache file name crosses the process boundary, never a DataFrame. Returns
+    the parse time of each file parsed and the error of each file that failed.
+    """
+    if not cache_enabled():
+        return {}, {}
+    parts = [part for path in paths for part in input_parts(path)]
+    paths = [path for path in dict.fromkeys(parts) if not os.path.exists(cache_file(path))]
+    parsed, errors = {}, {}
+    if not paths:
+        return parsed, errors
+    # Largest files first, so one big file does not start last
+    paths.sort(key=os.path.getsize, reverse=True)
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(paths))) as executor:
+        futures = {executor.submit(parse_to_cache, path, CACHE_DIR): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                parsed[futures[future]] = future.result()
+            except Exception as e:
+                errors[futures[future]] = e
+    return parsed, errors
+
+
+def _read_chunks(path, chunksize, options):
+    with pd.read_csv(path, chunksize=chunksize, **options) as reader:
+        for chunk in reader:
+            yield parse_temporal_columns(chunk)
+
+
+def _table_chunks(table, chunksize):
+    for batch in table.to_batches(max_chunksize=chunksize):
+        yield batch.to_pandas()
+
+
+def column_values(series, dates_as_datetime=False):
+    """Column as a list of native Python values, with None for missing entries.
+
+    Timezone-aware columns give datetimes, naive ones (calendar dates) give dates unless
+    dates_as_datetime is set, for targets such as BSON that have no date-only type.
+    """
+    # pandas 2 returns an ndarray from to_pydatetime, pandas 3 a Series
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        values = pd.Series(series.dt.to_pydatetime(), index=series.index, dtype=object)
+    elif pd.api.types.is_datetime64_dtype(series.dtype):
+        values = (pd.Series(series.dt.to_pydatetime(), index=series.index, dtype=object)
+                  if dates_as_datetime else series.dt.date)
+    else:
+        values = series
+    return values.astype(object).where(series.notna(), None).tolist()
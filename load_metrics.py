@@ -0,0 +1,176 @@
+import json
+import os
+import resource
+import threading
+import time
+
+# Metrics of a load run, shared by population_mongo.py and population_neo4j.py.
+# Each run writes a JSON report and a Prometheus text file (node_exporter textfile format).
+
+# Directory of the reports
+METRICS_DIR = "metrics"
+
+# Server-side counters read from each Neo4j result summary
+SERVER_COUNTERS = ("nodes_created", "relationships_created", "properties_set", "labels_added")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and cannot be reset
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    """Reset the peak resident set size of this process where the OS allows it"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class StageMetrics:
+    """Counters of one load stage (a node label, a relationship file, a collection)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.batches = 0
+        self.retries = 0
+        self.counters = {}
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self._lock = threading.Lock()
+        self._started = None
+
+    def start(self):
+        self._started = (time.perf_counter(), time.process_time())
+
+    def finish(self):
+        wall, cpu = self._started
+        self.wall_seconds = time.perf_counter() - wall
+        # Process-wide CPU time, so stages running concurrently overlap
+        self.cpu_seconds = time.process_time() - cpu
+        self.peak_rss_mb = peak_rss_mb()
+
+    def batch_committed(self, rows, retries=0, counters=None):
+        """Record a committed batch with its retried attempts and server counters"""
+        with self._lock:
+            self.rows += rows
+            self.batches += 1
+            self.retries += retries
+            for name, value in (counters or {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_counter(self, name, value):
+        """Add to a counter reported next to the server counters"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def rows_per_second(self):
+        return self.rows / self.wall_seconds if self.wall_seconds else 0.0
+
+    def to_dict(self):
+        return {"stage": self.name, "rows": self.rows, "batches": self.batches,
+                "retries": self.retries, "wall_seconds": round(self.wall_seconds, 3),
+                "rows_per_second": round(self.rows_per_second(), 1),
+                "cpu_seconds": round(self.cpu_seconds, 3),
+                "peak_rss_mb": round(self.peak_rss_mb, 1), "counters": dict(self.counters)}
+
+
+def summary_counters(summary):
+    """The SERVER_COUNTERS of a Neo4j result summary as a dict"""
+    return {name: getattr(summary.counters, name, 0) for name in SERVER_COUNTERS}
+
+
+class LoadMetrics:
+    """Per-stage metrics of a load run and their JSON / Prometheus reports"""
+
+    def __init__(self, loader, parameters=None):
+        self.loader = loader
+        self.parameters = parameters or {}
+        self.stages = {}
+        self.started_at = time.time()
+        self._started = (time.perf_counter(), time.process_time())
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Metrics of a stage, created on first use"""
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageMetrics(name)
+            return self.stages[name]
+
+    def report(self):
+        wall, cpu = self._started
+        return {"loader": self.loader,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+                "parameters": self.parameters,
+                "wall_seconds": round(time.perf_counter() - wall, 3),
+                "cpu_seconds": round(time.process_time() - cpu, 3),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+                "stages": [stage.to_dict() for stage in self.stages.values()]}
+
+    def prometheus(self, report):
+        """The report in the Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP ldbc_load_{name} {help_text}")
+            lines.append(f"# TYPE ldbc_load_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_label_value(val)}"' for key, val in labels.items())
+                lines.append(f"ldbc_load_{name}{{{label_text}}} {value}")
+
+        run = {"loader": self.loader}
+        metric("run_info", "gauge", "Parameters of the load run",
+               [({**run, **{key: str(val) for key, val in self.parameters.items()}}, 1)])
+        metric("run_wall_seconds", "gauge", "Wall time of the load run", [(run, report["wall_seconds"])])
+        metric("run_cpu_seconds", "gauge", "Client CPU time of the load run", [(run, report["cpu_seconds"])])
+        metric("run_peak_rss_bytes", "gauge", "Peak resident set size of the loader",
+               [(run, int(report["peak_rss_mb"] * 1024 * 1024))])
+
+        stages = report["stages"]
+        for key, name, kind, help_text in (
+                ("rows", "stage_rows_total", "counter", "Rows written by the stage"),
+                ("batches", "stage_batches_total", "counter", "Batches committed by the stage"),
+                ("retries", "stage_retries_total", "counter", "Retried transaction attempts of the stage"),
+                ("wall_seconds", "stage_wall_seconds", "gauge", "Wall time of the stage"),
+                ("rows_per_second", "stage_rows_per_second", "gauge", "Write throughput of the stage"),
+                ("cpu_seconds", "stage_cpu_seconds", "gauge", "Process CPU time during the stage")):
+            metric(name, kind, help_text, [({**run, "stage": stage["stage"]}, stage[key]) for stage in stages])
+        metric("stage_peak_rss_bytes", "gauge", "Process peak resident set size at the end of the stage",
+               [({**run, "stage": stage["stage"]}, int(stage["peak_rss_mb"] * 1024 * 1024)) for stage in stages])
+        metric("stage_server_counter_total", "counter", "Server-side update counters of the stage",
+               [({**run, "stage": stage["stage"], "counter": counter}, value)
+                for stage in stages for counter, value in stage["counters"].items()])
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory=METRICS_DIR):
+        """Write {loader}_metrics.json and {loader}_metrics.prom; returns the JSON path"""
+        os.makedirs(directory, exist_ok=True)
+        report = self.report()
+        json_path = os.path.join(directory, f"{self.loader}_metrics.json")
+        _write_atomic(json_path, json.dumps(report, indent=2))
+        # Renamed into place, so a textfile collector never reads a partial file
+        _write_atomic(os.path.join(directory, f"{self.loader}_metrics.prom"), self.prometheus(report))
+        return json_path
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -1,11 +1,35 @@
 import pandas as pd
 from pymongo import MongoClient
+from bson import encode
+from bson.raw_bson import RawBSONDocument
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import argparse
 import os
+import time
+
+import ldbc_csv
+from ldbc_csv import read_ldbc_csv, column_values
+import load_metrics
+from load_metrics import LoadMetrics, peak_rss_mb, reset_peak_rss
 
 # Parametri
 MONGO_URI = "mongodb://localhost:27017/"
 DB_NAME = "MAADB"
 
+# Modalità parallela: dimensione dei batch, thread per collezione e collezioni caricate insieme
+BATCH_SIZE = 10000
+INSERT_WORKERS = 4
+COLLECTION_WORKERS = 3
+
+# Codifica dei documenti: "raw" codifica in BSON un batch alla volta, "dicts" crea prima tutti i dizionari
+ENCODING = "raw"
+
+# Suffisso delle collezioni di staging usate da --reload
+STAGING_SUFFIX = "__staging"
+
+# Processi che analizzano i CSV nella cache prima del caricamento (0 = nessuno)
+PARSE_WORKERS = os.cpu_count()
+
 # File CSV da caricare e nome collezione Mongo corrispondente
 csv_files = {
     "Organisation": "test/static/organisation_0_0.csv",
@@ -21,59 +45,421 @@ csv_files = {
     "ForumContainerPost": "test/dynamic/forum_containerOf_post_0_0.csv"
 }
 
-# Connessione a MongoDB
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-curr_dir = os.getcwd()
+# Relazioni incorporate nei documenti al caricamento: collezione -> (file, chiave, colonna, campo)
+# La chiave e la colonna sono i nomi dopo rename_columns, il campo è quello aggiunto al documento
+embedded_relations = {
+    "Post": [("test/dynamic/forum_containerOf_post_0_0.csv", "postId", "forumId", "forumId"),
+             ("test/dynamic/post_hasCreator_person_0_0.csv", "postId", "personId", "creatorId")],
+    "Comment": [("test/dynamic/comment_hasCreator_person_0_0.csv", "commentId", "personId", "creatorId")],
+}
 
-# Caricamento dei file CSV
-for collection_name, filename in csv_files.items():
-   
-    path = os.path.join(curr_dir, filename)
-    
+# Indici usati dalle query della GUI (GUI/routes/api.js): collezione, chiavi, campi filtrati dalla query
+gui_indexes = [
+    # queryLookUp1: luogo per nome e tipo, persone del luogo o dei luoghi contenuti (placePath, multikey)
+    ("Place", [("name", 1), ("type", 1)], ["name", "type"]),
+    ("IsLocatedInPlace", [("placePath", 1)], ["placePath"]),
+    # queryLookUp3: forum dei post in una lingua, con distinct su forumId incorporato nei post
+    ("Post", [("language", 1), ("forumId", 1)], ["language"]),
+    # queryAnalitica1: nomi delle università
+    ("Organisation", [("id", 1)], ["id"]),
+]
 
-    try:
-        # Leggi il CSV (modifica sep se serve)
-        df = pd.read_csv(path, sep="|")
+# Indice della ricerca precedente di queryLookUp3, creato solo con --report-latency per il confronto
+latency_indexes = [
+    ("ForumContainerPost", [("postId", 1), ("forumId", 1)], ["postId"]),
+]
 
-        # Rinomina le colonne
 
-        has_id_1 = any(col.endswith('.id.1') for col in df.columns)
-        
-        new_columns = []
-        for col in df.columns:
-            if col.endswith('.id.1'):
-                col = col.lower()
-                new_col = col.replace('.id.1', 'From')
-                new_columns.append(new_col)
-            elif col.endswith('.id'):
-                col = col.lower()
-                if has_id_1:
-                    new_col = col.replace('.id', 'To')
-                else:
-                    new_col = col.replace('.id', 'Id')
-                new_columns.append(new_col)
+def prefetch_csv(workers=PARSE_WORKERS):
+    """Analizza tutti i CSV nella cache colonnare con un pool di processi"""
+    if not workers or not ldbc_csv.cache_enabled():
+        return
+    start_time = time.time()
+    # Anche i file delle relazioni incorporate, letti durante la trasformazione
+    filenames = [*csv_files.values(),
+                 *(filename for relations in embedded_relations.values() for filename, *_ in relations)]
+    paths = [os.path.join(os.getcwd(), filename) for filename in dict.fromkeys(filenames)]
+    parsed, errors = ldbc_csv.prefetch(paths, workers)
+    for path, error in errors.items():
+        print(f"Errore durante l'analisi di '{path}': {error}")
+    if parsed:
+        print(f"Analizzati {len(parsed)} file con {workers} processi in {time.time() - start_time:.2f} s.")
+
+
+def rename_columns(df):
+    """Rinomina le colonne Entity.id / Entity.id.1 in entityId, entityTo, entityFrom"""
+    has_id_1 = any(col.endswith('.id.1') for col in df.columns)
+
+    new_columns = []
+    for col in df.columns:
+        if col.endswith('.id.1'):
+            col = col.lower()
+            new_col = col.replace('.id.1', 'From')
+            new_columns.append(new_col)
+        elif col.endswith('.id'):
+            col = col.lower()
+            if has_id_1:
+                new_col = col.replace('.id', 'To')
             else:
-                new_columns.append(col)
-        
-        df.columns = new_columns
+                new_col = col.replace('.id', 'Id')
+            new_columns.append(new_col)
+        else:
+            new_columns.append(col)
+
+    df.columns = new_columns
+    return df
+
+
+def place_ancestry(filename=csv_files["PlaceIsPartOfPlace"]):
+    """Calcola per ogni luogo la lista dei suoi antenati (città -> paese -> continente)"""
+    df = read_ldbc_csv(os.path.join(os.getcwd(), filename))
+
+    # Place.id è contenuto in Place.id.1
+    parent = pd.Series(df["Place.id.1"].values, index=df["Place.id"].values)
+
+    # Risale la gerarchia un livello alla volta per tutti i luoghi insieme
+    levels = [parent]
+    while levels[-1].notna().any() and len(levels) < len(parent) + 1:
+        levels.append(levels[-1].map(parent))
+    chain = pd.concat(levels, axis=1)
+
+    return {place: [int(ancestor) for ancestor in row if pd.notna(ancestor)]
+            for place, row in zip(chain.index, chain.itertuples(index=False))}
+
+
+def place_hierarchy_transforms(ancestry):
+    """Trasformazioni che denormalizzano la gerarchia dei luoghi in Place e IsLocatedInPlace"""
+    def add_ancestors(df):
+        # Array degli antenati del luogo (vuoto per i continenti)
+        df["ancestors"] = [ancestry.get(place, []) for place in df["id"]]
+        return df
+
+    def add_place_path(df):
+        # Luogo della persona seguito dai suoi antenati: una sola query per città, paese o continente
+        df["placePath"] = [[place] + ancestry.get(place, []) for place in df["placeId"]]
+        return df
+
+    return {"Place": add_ancestors, "IsLocatedInPlace": add_place_path}
+
+
+def embed_relations(df, relations):
+    """Aggiunge ai documenti l'id collegato da ogni relazione, con un merge sulla colonna id"""
+    for filename, key, column, field in relations:
+        start_time = time.time()
+        rel = rename_columns(read_ldbc_csv(os.path.join(os.getcwd(), filename)))
+        rel = rel[[key, column]].drop_duplicates(key).rename(columns={key: "id", column: field})
+        df = df.merge(rel, on="id", how="left")
+        # I documenti senza relazione restano senza il campo, senza passare a float
+        df[field] = df[field].astype("Int64")
+        print(f"Incorporato '{field}' da '{filename}' in {df[field].notna().sum()} documenti "
+              f"in {time.time() - start_time:.2f} s.")
+    return df
+
+
+def relation_transforms():
+    """Trasformazioni che incorporano embedded_relations nelle rispettive collezioni"""
+    return {collection_name: lambda df, relations=relations: embed_relations(df, relations)
+            for collection_name, relations in embedded_relations.items()}
+
+
+def combine_transforms(*transforms):
+    """Unisce più dizionari collezione -> trasformazione, applicandole in ordine"""
+    combined = {}
+    for mapping in transforms:
+        for collection_name, transform in mapping.items():
+            previous = combined.get(collection_name)
+            combined[collection_name] = (transform if previous is None else
+                                         lambda df, first=previous, second=transform: second(first(df)))
+    return combined
+
+
+def to_documents(df):
+    """Converte il DataFrame in documenti con date BSON native, omettendo i campi mancanti"""
+    keys = list(df.columns)
+    columns = [column_values(df[col], dates_as_datetime=True) for col in keys]
+    return [{key: value for key, value in zip(keys, row) if value is not None} for row in zip(*columns)]
+
+
+def raw_batches(df, batch_size=BATCH_SIZE):
+    """Codifica il DataFrame in batch di documenti BSON già serializzati.
+
+    I dizionari esistono solo per un batch alla volta e pymongo invia i byte così come sono,
+    quindi la lista completa dei documenti non viene mai creata.
+    """
+    for start in range(0, len(df), batch_size):
+        documents = to_documents(df.iloc[start:start + batch_size])
+        yield [RawBSONDocument(encode(document)) for document in documents]
+
+
+def dict_batches(df, batch_size=BATCH_SIZE):
+    """Batch di una lista di dizionari creata per intero (codifica "dicts")"""
+    data = to_documents(df)
+    return [data[i:i + batch_size] for i in range(0, len(data), batch_size)]
+
+
+def insert_batches(collection, batches, workers=INSERT_WORKERS, metrics=None, ordered=False):
+    """Inserisce i batch da un pool di thread, con al massimo workers * 2 batch in attesa"""
+    def insert(batch):
+        # insert_many solleva un'eccezione se fallisce; inserted_ids non contiene i RawBSONDocument
+        collection.insert_many(batch, ordered=ordered)
+        inserted = len(batch)
+        if metrics:
+            metrics.batch_committed(len(batch), counters={"documents_inserted": inserted})
+        return inserted
+
+    inserted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for batch in batches:
+            # I batch vengono codificati mentre i precedenti sono in volo, senza accumularli
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                inserted += sum(future.result() for future in done)
+            pending.add(executor.submit(insert, batch))
+        inserted += sum(future.result() for future in pending)
+    return inserted
+
+
+def staging_name(collection_name):
+    return collection_name + STAGING_SUFFIX
+
 
-        # Converti in dizionari
-        data = df.to_dict(orient="records")
+def load_collection(db, collection_name, filename, parallel=False,
+                    batch_size=BATCH_SIZE, workers=INSERT_WORKERS, transform=None, metrics=None,
+                    encoding=ENCODING, target=None):
+    """Carica un file CSV nella collezione indicata, registrando le metriche della collezione.
+
+    I documenti vengono scritti in target (di default la collezione stessa). Restituisce il
+    numero di righe lette dal CSV, o None in caso di errore.
+    """
+    path = os.path.join(os.getcwd(), filename)
+    target = target or collection_name
+    stage = metrics.stage(collection_name) if metrics else None
+    if stage:
+        stage.start()
+    if not parallel:
+        reset_peak_rss()
+
+    try:
+        # Leggi il CSV con colonne tipizzate (id interi, categorie, date native), dalla cache se valida
+        start_time = time.time()
+        df = read_ldbc_csv(path)
+        print(f"Letti {len(df)} record da '{filename}' in {time.time() - start_time:.2f} s.")
+
+        # Rinomina le colonne
+        df = rename_columns(df)
+
+        # Campi derivati calcolati al caricamento
+        if transform is not None:
+            df = transform(df)
 
         # Crea collezione se non esiste
-        if collection_name not in db.list_collection_names():
-            db.create_collection(collection_name)
-            print(f"Collezione '{collection_name}' creata.")
+        if target not in db.list_collection_names():
+            db.create_collection(target)
+            print(f"Collezione '{target}' creata.")
         else:
-            print(f"Collezione '{collection_name}' già esistente. Inserisco comunque dati.")
+            print(f"Collezione '{target}' già esistente. Inserisco comunque dati.")
 
-        # Inserisci dati
-        if data:
-            db[collection_name].insert_many(data)
-            print(f"Inseriti {len(data)} documenti in '{collection_name}'.")
+        # Converti in documenti e inserisci i dati
+        if len(df):
+            start_time = time.time()
+            if encoding == "raw":
+                batches = raw_batches(df, batch_size)
+            else:
+                batches = dict_batches(df, batch_size)
+            if parallel:
+                inserted = insert_batches(db[target], batches, workers, stage)
+            else:
+                inserted = insert_batches(db[target], batches, 1, stage, ordered=True)
+            elapsed = time.time() - start_time
+            # In modalità parallela il picco è quello dell'intero processo
+            print(f"Inseriti {inserted} documenti in '{target}' "
+                  f"in {elapsed:.2f} s ({inserted / max(elapsed, 1e-9):.0f} documenti/s, "
+                  f"codifica {encoding}, picco RSS {peak_rss_mb():.1f} MB).")
         else:
             print(f"File CSV '{filename}' vuoto. Nessun dato inserito.")
+        return len(df)
 
     except Exception as e:
         print(f"Errore durante il caricamento di '{filename}': {e}")
+        return None
+    finally:
+        if stage:
+            stage.finish()
+
+
+def build_indexes(db, targets=None, indexes=gui_indexes):
+    """Crea gli indici (di default quelli della GUI) dopo il caricamento, così gli inserimenti non li aggiornano.
+
+    targets associa a ogni collezione quella in cui è stata caricata (ad esempio lo staging).
+    """
+    for collection_name, keys, _ in indexes:
+        target = (targets or {}).get(collection_name, collection_name)
+        start_time = time.time()
+        index_name = db[target].create_index(keys)
+        print(f"Indice '{index_name}' su '{target}' creato in {time.time() - start_time:.2f} s.")
+
+
+def swap_staging(db, expected):
+    """Controlla i conteggi delle collezioni di staging e le sostituisce a quelle attive.
+
+    Se un conteggio non torna nessuna collezione viene sostituita e gli staging restano
+    disponibili per l'analisi. Ogni rename è atomico: la GUI legge i dati vecchi o quelli
+    nuovi, mai un caricamento a metà.
+    """
+    failed = []
+    for collection_name, rows in expected.items():
+        count = db[staging_name(collection_name)].count_documents({})
+        if rows is None or count != rows:
+            failed.append(collection_name)
+            print(f"ERRORE: '{staging_name(collection_name)}' contiene {count} documenti, attesi {rows}.")
+    if failed:
+        print(f"Collezioni attive non sostituite: {', '.join(failed)} non valide.")
+        return False
+
+    for collection_name in expected:
+        db[staging_name(collection_name)].rename(collection_name, dropTarget=True)
+        print(f"Collezione '{collection_name}' sostituita da '{staging_name(collection_name)}'.")
+    return True
+
+
+def verify_indexes(db):
+    """Controlla con explain() che le query della GUI usino un IXSCAN"""
+    for collection_name, keys, fields in gui_indexes:
+        # Valori realistici per il filtro presi da un documento esistente
+        sample = db[collection_name].find_one({field: {"$exists": True} for field in fields})
+        if sample is None:
+            print(f"Nessun documento in '{collection_name}' per verificare l'indice.")
+            continue
+
+        # Sui campi multikey la GUI cerca un solo elemento (placePath: place.id), non l'array intero
+        query = {field: sample[field][-1] if isinstance(sample[field], list) else sample[field]
+                 for field in fields}
+        plan = db[collection_name].find(query).explain()["queryPlanner"]["winningPlan"]
+        if "IXSCAN" in str(plan):
+            print(f"Query su '{collection_name}' {list(query)}: IXSCAN.")
+        else:
+            print(f"ATTENZIONE: la query su '{collection_name}' {list(query)} non usa un indice.")
+
+
+def report_lookup_latency(db, repeats=5):
+    """Confronta la latenza di queryLookUp3 con forumId incorporato e con ForumContainerPost indicizzata"""
+    sample = db.Post.find_one({"language": {"$exists": True}, "forumId": {"$exists": True}})
+    if sample is None:
+        return
+    language = sample["language"]
+
+    def joined():
+        post_ids = [post["id"] for post in db.Post.find({"language": language}, {"id": 1, "_id": 0})]
+        return set(db.ForumContainerPost.distinct("forumId", {"postId": {"$in": post_ids}}))
+
+    def embedded():
+        return set(db.Post.distinct("forumId", {"language": language}))
+
+    timings = {}
+    for name, query in (("ForumContainerPost + $in", joined), ("distinct su forumId", embedded)):
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            forums = query()
+        timings[name] = (time.perf_counter() - start_time) / repeats
+        print(f"queryLookUp3 ('{language}', {len(forums)} forum) con {name}: {timings[name] * 1000:.1f} ms.")
+
+
+def parse_args():
+    """Opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Popola MongoDB con il dataset LDBC")
+    parser.add_argument("--parallel", action="store_true",
+                        help="inserimenti in batch non ordinati, più collezioni in parallelo")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="documenti per batch")
+    parser.add_argument("--workers", type=int, default=INSERT_WORKERS,
+                        help="thread di inserimento per collezione")
+    parser.add_argument("--encoding", choices=["raw", "dicts"], default=ENCODING,
+                        help="documenti codificati in BSON per batch (raw) o lista completa di dizionari (dicts)")
+    parser.add_argument("--collections", type=int, default=COLLECTION_WORKERS,
+                        help="collezioni caricate contemporaneamente")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS,
+                        help="processi che analizzano i CSV nella cache prima del caricamento (0 per disattivare)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="rilegge sempre i CSV senza usare la cache colonnare")
+    parser.add_argument("--reload", action="store_true",
+                        help="carica in collezioni di staging e le sostituisce a quelle attive a caricamento validato")
+    parser.add_argument("--no-indexes", action="store_true",
+                        help="non creare gli indici della GUI dopo il caricamento")
+    parser.add_argument("--report-latency", action="store_true",
+                        help="confronta la latenza di queryLookUp3 con la ricerca precedente su ForumContainerPost")
+    parser.add_argument("--metrics-dir", default=load_metrics.METRICS_DIR,
+                        help="cartella dei report delle metriche (JSON e Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="non scrivere i report delle metriche")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.no_cache:
+        ldbc_csv.CACHE_DIR = None
+    evicted = ldbc_csv.evict_stale_cache()
+    if evicted:
+        print(f"Rimosse {evicted} voci obsolete dalla cache.")
+
+    # Prima di aprire connessioni e thread, così i processi figli nascono puliti
+    prefetch_csv(args.parse_workers)
+
+    # Connessione a MongoDB, con un pool di connessioni grande quanto la concorrenza
+    pool_size = args.workers * args.collections if args.parallel else 100
+    client = MongoClient(MONGO_URI, maxPoolSize=pool_size)
+    db = client[DB_NAME]
+
+    # Metriche per collezione, salvate anche se il caricamento si interrompe
+    metrics = None
+    if not args.no_metrics:
+        metrics = LoadMetrics("mongo", {"parallel": args.parallel, "encoding": args.encoding,
+                                        "batch_size": args.batch_size,
+                                        "workers": args.workers, "collections": args.collections})
+
+    try:
+        # Gerarchia dei luoghi ricalcolata a ogni esecuzione dal CSV
+        transforms = combine_transforms(place_hierarchy_transforms(place_ancestry()), relation_transforms())
+
+        # Con --reload si carica in staging, senza indici, lasciando intatte le collezioni attive
+        targets = {name: staging_name(name) if args.reload else name for name in csv_files}
+        if args.reload:
+            for target in targets.values():
+                db.drop_collection(target)
+
+        # Caricamento dei file CSV
+        if args.parallel:
+            with ThreadPoolExecutor(max_workers=args.collections) as executor:
+                futures = {collection_name: executor.submit(load_collection, db, collection_name, filename,
+                                                            True, args.batch_size, args.workers,
+                                                            transforms.get(collection_name), metrics,
+                                                            args.encoding, targets[collection_name])
+                           for collection_name, filename in csv_files.items()}
+            rows = {collection_name: future.result() for collection_name, future in futures.items()}
+        else:
+            rows = {collection_name: load_collection(db, collection_name, filename, batch_size=args.batch_size,
+                                                     transform=transforms.get(collection_name), metrics=metrics,
+                                                     encoding=args.encoding, target=targets[collection_name])
+                    for collection_name, filename in csv_files.items()}
+
+        # Indici solo a caricamento concluso
+        if not args.no_indexes:
+            build_indexes(db, targets)
+            if args.report_latency:
+                build_indexes(db, targets, latency_indexes)
+        if args.reload and not swap_staging(db, rows):
+            return
+        if not args.no_indexes:
+            verify_indexes(db)
+            if args.report_latency:
+                report_lookup_latency(db)
+    finally:
+        client.close()
+        if metrics:
+            print(f"Metriche del caricamento salvate in '{metrics.write(args.metrics_dir)}'.")
+
+
+if __name__ == "__main__":
+    main()
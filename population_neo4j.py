@@ -1,9 +1,22 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase
+from neo4j.exceptions import Neo4jError
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import argparse
+import asyncio
+import json
+import queue
 import os
+import threading
+import numpy as np
 import pandas as pd
 import time
 import logging
 
+import ldbc_csv
+from ldbc_csv import read_ldbc_csv, column_values
+import load_metrics
+from load_metrics import LoadMetrics, peak_rss_mb, reset_peak_rss, summary_counters
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -11,10 +24,76 @@ logger = logging.getLogger(__name__)
 # Database connection parameters
 URI = "neo4j://localhost:7687"
 AUTH = ("neo4j", "qwerty123")
+# Target database, only needed to drop and recreate it
+DATABASE = "neo4j"
 
-# Batch size for operations
+# Batch size for operations, the starting point of the adaptive batch sizes
 BATCH_SIZE = 5000
 
+# Adaptive batch sizes: each stage tunes its size towards TARGET_TX_SECONDS per transaction
+ADAPTIVE_BATCHES = True
+TARGET_TX_SECONDS = 1.0
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 100000
+# Upper bound on the estimated size of a batch parameter
+MAX_PAYLOAD_BYTES = 16 * 1024 * 1024
+# Records serialized to estimate the payload of a batch
+PAYLOAD_SAMPLE = 20
+# Sizes learned by previous runs, per stage
+BATCH_SIZES_FILE = "batch_sizes.json"
+LEARNED_BATCH_SIZES = {}
+BATCH_SIZES_LOCK = threading.Lock()
+
+# Rows deleted per transaction when clearing the database
+DELETE_BATCH_SIZE = 10000
+
+# Number of concurrent sessions used to write relationship batches (1 = serial)
+WORKERS = 1
+
+# Write engine: "sync" sessions, or "async" pipelined transactions on the async driver
+BACKEND = "sync"
+# Prepared batches waiting for a transaction in the async engine
+ASYNC_QUEUE_SIZE = 8
+# Running AsyncLoader when BACKEND is "async"
+ASYNC_LOADER = None
+
+# Stream CSV files in chunks instead of loading them whole
+STREAMING = False
+CHUNK_SIZE = 50000
+
+# Processes parsing the input files into the parse cache before the load (0 = no prefetch)
+PARSE_WORKERS = os.cpu_count()
+
+# Seconds to wait for indexes to come online
+INDEX_TIMEOUT = 600
+
+# Maximum number of import stages running at the same time
+STAGE_CONCURRENCY = 4
+
+# Target nodes updated per transaction by the materialization stages
+MATERIALIZE_BATCH_SIZE = 1000
+
+# Use MERGE on id instead of CREATE, so replayed batches do not duplicate data
+MERGE_MODE = False
+
+# Compute the MATERIALIZATIONS once their input relationships are loaded
+MATERIALIZE = True
+
+# Progress of the last import, used by --resume
+CHECKPOINT_FILE = "import_checkpoint.json"
+
+# Metrics of the current run (a LoadMetrics), None when disabled
+METRICS = None
+
+# Example ids logged for relationship rows whose endpoint node does not exist
+DANGLING_SAMPLES = 5
+
+# Drop relationship rows whose endpoint id is not in NODE_ID_INDEX before sending them
+FILTER_ENDPOINTS = True
+# Sorted array of the ids of each label, filled as node stages complete
+NODE_ID_INDEX = {}
+NODE_ID_INDEX_LOCK = threading.Lock()
+
 def connect_to_db():
     """Connect to Neo4j database"""
     driver = GraphDatabase.driver(URI, auth=AUTH)
@@ -26,628 +105,1420 @@ def connect_to_db():
         logger.error(f"Failed to connect to Neo4j: {e}")
         return None
     
-def clear_db(driver):
-    """Clear the database of all nodes and relationships"""
+def schema_statements(driver):
+    """Statements recreating the constraints and the indexes they do not own"""
     with driver.session() as session:
-        start_time = time.time()
-        # Clear all relationships first, then nodes
-        session.run("MATCH ()-[r]->() DELETE r")
-        session.run("MATCH (n) DELETE n")
+        constraints = session.run("SHOW CONSTRAINTS YIELD createStatement RETURN createStatement").value()
+        indexes = session.run(
+            "SHOW INDEXES YIELD type, owningConstraint, createStatement "
+            "WHERE owningConstraint IS NULL AND type <> 'LOOKUP' RETURN createStatement"
+        ).value()
+    return constraints + indexes
+
+def drop_schema(driver):
+    """Drop all constraints and secondary indexes"""
+    with driver.session() as session:
+        for name in session.run("SHOW CONSTRAINTS YIELD name RETURN name").value():
+            session.run(f"DROP CONSTRAINT `{name}` IF EXISTS").consume()
+    drop_secondary_indexes(driver)
+
+def recreate_database(driver, preserve_schema=True):
+    """Drop and recreate the target database. Returns False if the server does not allow it"""
+    statements = schema_statements(driver) if preserve_schema else []
+    try:
+        with driver.session(database="system") as session:
+            session.run(f"CREATE OR REPLACE DATABASE `{DATABASE}` WAIT").consume()
+    except Neo4jError as e:
+        logger.warning(f"Cannot recreate database {DATABASE} ({e.code}), deleting in batches instead")
+        return False
+    
+    with driver.session(database=DATABASE) as session:
+        for statement in statements:
+            session.run(statement).consume()
+    logger.info(f"Recreated database {DATABASE} with {len(statements)} schema statements")
+    return True
+
+def delete_in_batches(session, query, what, batch_size):
+    """Repeat a LIMITed delete query, one transaction each, until nothing is left"""
+    total = 0
+    while True:
+        deleted = session.run(query, limit=batch_size).single()["deleted"]
+        total += deleted
+        if deleted:
+            logger.info(f"Deleted {total} {what}")
+        if deleted < batch_size:
+            return total
+
+def clear_db(driver, batch_size=DELETE_BATCH_SIZE, drop_database=False, preserve_schema=True):
+    """Clear the database of all nodes and relationships.
+    
+    Deletes run in bounded transactions so they never exhaust the transaction memory pool.
+    With drop_database the database is recreated instead, when the server allows it.
+    """
+    start_time = time.time()
+    if drop_database and recreate_database(driver, preserve_schema):
         logger.info(f"Cleared database in {time.time() - start_time:.2f} seconds")
+        return
+    
+    with driver.session() as session:
+        # Clear all relationships first, then nodes
+        relationships = delete_in_batches(
+            session, "MATCH ()-[r]->() WITH r LIMIT $limit DELETE r RETURN count(r) AS deleted",
+            "relationships", batch_size)
+        nodes = delete_in_batches(
+            session, "MATCH (n) WITH n LIMIT $limit DELETE n RETURN count(n) AS deleted",
+            "nodes", batch_size)
+    
+    if not preserve_schema:
+        drop_schema(driver)
+    logger.info(f"Cleared database ({relationships} relationships, {nodes} nodes) "
+                f"in {time.time() - start_time:.2f} seconds")
 
 def find_file(base_path):
-    """Find a file using different path strategies"""
-    if os.path.exists(base_path):
+    """Find a file using different path strategies.
+    
+    A file exists when any of its datagen parts does, compressed or not.
+    """
+    if ldbc_csv.input_parts(base_path):
         return base_path
     
     # Extract filename from path
     filename = os.path.basename(base_path)
     alt_path = os.path.join(os.getcwd(), filename)
     
-    if os.path.exists(alt_path):
+    if ldbc_csv.input_parts(alt_path):
         return alt_path
     
     logger.error(f"File not found: {base_path}")
     return None
 
-def load_csv_data(path_name):
-    """Load and preprocess CSV data"""
+def stream_csv_data(file_path, chunk_size=CHUNK_SIZE, usecols=None):
+    """Yield a CSV file as typed DataFrame chunks of at most chunk_size rows"""
+    total = 0
+    for chunk in read_ldbc_csv(file_path, chunksize=chunk_size, usecols=usecols):
+        total += len(chunk)
+        yield chunk
+    # Process-wide, so it includes concurrently running stages
+    logger.info(f"Streamed {total} records from {file_path} (process peak RSS {peak_rss_mb():.1f} MB)")
+
+def load_csv_data(path_name, stream=None, usecols=None):
+    """Load CSV data with typed columns and native dates.
+    
+    In streaming mode a generator of chunks is returned instead of a whole DataFrame.
+    """
     file_path = find_file(path_name)
     if not file_path:
         return None
     
+    if STREAMING if stream is None else stream:
+        return stream_csv_data(file_path, usecols=usecols)
+    
     try:
-        data = pd.read_csv(file_path, sep="|", encoding="utf-8")
-        logger.info(f"Loaded {len(data)} records from {file_path}")
+        start_time = time.time()
+        data = read_ldbc_csv(file_path, usecols=usecols)
+        logger.info(f"Loaded {len(data)} records from {file_path} in {time.time() - start_time:.2f} seconds")
         return data
     except Exception as e:
         logger.error(f"Error loading data: {e}")
         return None
 
-def process_datetime_fields(df, date_columns):
-    """Process datetime fields in the dataframe"""
-    for col in date_columns:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-            # Format as ISO string for Neo4j
-            df[col] = df[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
-    return df
+def prefetch_inputs(workers=PARSE_WORKERS):
+    """Parse every input file of the manifest into the parse cache in a process pool"""
+    if not workers or not ldbc_csv.cache_enabled():
+        return
+    paths = [find_file(spec["path"]) for spec in [*NODE_IMPORTS, *RELATIONSHIP_IMPORTS]]
+    start_time = time.time()
+    parsed, errors = ldbc_csv.prefetch([path for path in paths if path], workers)
+    for path, error in errors.items():
+        logger.error(f"Failed to parse {path}: {error}")
+    if parsed:
+        logger.info(f"Parsed {len(parsed)} files with {workers} processes in {time.time() - start_time:.2f} seconds "
+                    f"(longest {max(parsed.values()):.2f} seconds)")
+
+def map_frames(data, func):
+    """Apply func to a DataFrame, or lazily to every chunk of a stream"""
+    if data is None or isinstance(data, pd.DataFrame):
+        return func(data) if data is not None else None
+    return (func(chunk) for chunk in data)
 
 def batch_process(data, batch_size=BATCH_SIZE):
-    """Split data into batches for processing"""
-    total_batches = (len(data) + batch_size - 1) // batch_size
-    for i in range(total_batches):
-        start_idx = i * batch_size
-        end_idx = min((i + 1) * batch_size, len(data))
-        yield data.iloc[start_idx:end_idx]
-
-def create_nodes(driver, label, data, id_field='id', batch_size=BATCH_SIZE):
-    """Create nodes in batches using efficient Cypher"""
-    if data is None or len(data) == 0:
-        logger.warning(f"No {label} data to insert")
+    """Split data into batches for processing.
+    
+    batch_size may be a BatchSizer, whose current size is read before every batch.
+    """
+    start_idx = 0
+    while start_idx < len(data):
+        size = batch_size.size if isinstance(batch_size, BatchSizer) else batch_size
+        yield data.iloc[start_idx:start_idx + size]
+        start_idx += size
+
+def iter_batches(data, batch_size=BATCH_SIZE, prepare=None, skip=0):
+    """Split a DataFrame or a stream of chunks into (row offset, batch) pairs.
+    
+    Each chunk is prepared first. The first skip rows are left out, for resumed stages.
+    """
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    offset = 0
+    for chunk in chunks:
+        if prepare is not None:
+            chunk = prepare(chunk)
+        if offset + len(chunk) <= skip:
+            offset += len(chunk)
+            continue
+        if offset < skip:
+            chunk = chunk.iloc[skip - offset:]
+            offset = skip
+        for batch in batch_process(chunk, batch_size):
+            yield offset, batch
+            offset += len(batch)
+
+class Checkpoint:
+    """Completed stages and committed row offsets of an import, persisted as JSON.
+    
+    Offsets count rows in the order the stages send them, which depends on the
+    row_order_settings of the run that recorded them.
+    """
+    
+    def __init__(self, path=CHECKPOINT_FILE, settings=None):
+        self.path = path
+        self.completed = set()
+        self.offsets = {}
+        self.settings = settings
+        self._committed = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def load(cls, path=CHECKPOINT_FILE):
+        """Read the checkpoint left by a previous run, or start an empty one"""
+        checkpoint = cls(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            checkpoint.completed = set(state["completed"])
+            checkpoint.offsets = state["offsets"]
+            checkpoint.settings = state.get("settings")
+        return checkpoint
+    
+    def resume_with(self, settings):
+        """Adopt the settings of the resuming run.
+        
+        If they order rows differently from the recorded ones, partially loaded stages
+        restart from row 0 (MERGE makes the replay safe); completed stages are kept.
+        """
+        with self._lock:
+            if self.settings != settings and self.offsets:
+                logger.warning(f"Row order settings changed since the checkpoint ({self.settings} -> {settings}): "
+                               f"restarting {len(self.offsets)} partially loaded stages from the beginning")
+                self.offsets = {}
+            self.settings = settings
+            self.save()
+    
+    def offset(self, stage):
+        """Rows of a stage committed without gaps"""
+        return self.offsets.get(stage, 0)
+    
+    def batch_committed(self, stage, offset, count):
+        """Record a committed batch; the offset only advances over contiguous batches"""
+        with self._lock:
+            committed = self._committed.setdefault(stage, {})
+            committed[offset] = offset + count
+            watermark = self.offsets.get(stage, 0)
+            if watermark not in committed:
+                return
+            while watermark in committed:
+                watermark = committed.pop(watermark)
+            self.offsets[stage] = watermark
+            self.save()
+    
+    def reopen(self, stage):
+        """Forget that a stage completed, before running it again"""
+        with self._lock:
+            if stage in self.completed:
+                self.completed.discard(stage)
+                self.save()
+    
+    def stage_completed(self, stage):
+        with self._lock:
+            self.completed.add(stage)
+            self.offsets.pop(stage, None)
+            self._committed.pop(stage, None)
+            self.save()
+    
+    def save(self):
+        # Write and rename, so a crash never leaves a truncated checkpoint
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"completed": sorted(self.completed), "offsets": self.offsets,
+                       "settings": self.settings}, f, indent=2)
+        os.replace(tmp, self.path)
+
+def row_order_settings():
+    """Options that decide which rows a stage sends and in which order, so what a checkpoint offset counts"""
+    # Any number of workers above 1 sorts rows by start id the same way
+    return {"sorted_by_start_id": WORKERS > 1, "streaming": STREAMING, "chunk_size": CHUNK_SIZE,
+            "filter_endpoints": FILTER_ENDPOINTS}
+
+def log_progress(processed, total_records, what, batch_size, batch_len=None):
+    """Log import progress every batch_size * 5 rows"""
+    step = batch_size * 5
+    crossed = processed // step != (processed - (batch_len or 0)) // step if batch_len else processed % step == 0
+    if total_records is None:
+        if crossed:
+            logger.info(f"Created {processed} {what}")
+    elif crossed or processed == total_records:
+        logger.info(f"Created {processed}/{total_records} {what} ({processed/total_records*100:.1f}%)")
+
+class BatchSizer:
+    """Batch size of a stage, tuned after every commit towards a target transaction duration.
+    
+    The size follows the measured rows per second, is capped by the payload size of the
+    batch parameter and halves when the server runs out of transaction memory.
+    """
+    
+    def __init__(self, size=BATCH_SIZE, target_seconds=TARGET_TX_SECONDS,
+                 min_size=MIN_BATCH_SIZE, max_size=MAX_BATCH_SIZE, max_payload=MAX_PAYLOAD_BYTES):
+        self.size = min(max(size, min_size), max_size)
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_payload = max_payload
+        self.transactions = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, rows, seconds, payload):
+        """Adjust the size after a batch of rows committed in seconds with payload bytes"""
+        if rows == 0:
+            return
+        with self._lock:
+            self.transactions += 1
+            self.seconds += seconds
+            ideal = rows * self.target_seconds / max(seconds, 1e-3)
+            ideal = min(ideal, self.max_payload * rows / max(payload, 1))
+            if rows < self.size:
+                # A short batch (the end of a chunk) says nothing about larger ones
+                ideal = min(ideal, self.size)
+            # Geometric step, at most x2 or /2 per commit, so one slow commit does not swing the size
+            ideal = min(max((self.size * ideal) ** 0.5, self.size / 2), self.size * 2)
+            self.size = int(min(max(ideal, self.min_size), self.max_size))
+    
+    def shrink(self):
+        with self._lock:
+            self.size = max(self.min_size, self.size // 2)
+
+def batch_sizer(stage, batch_size=BATCH_SIZE):
+    """BatchSizer of a stage starting from its learned size, or None with fixed batches"""
+    if not ADAPTIVE_BATCHES:
+        return None
+    with BATCH_SIZES_LOCK:
+        return BatchSizer(LEARNED_BATCH_SIZES.get(stage, batch_size), TARGET_TX_SECONDS)
+
+def remember_batch_size(stage, sizer):
+    """Log the size a stage settled on and store it in BATCH_SIZES_FILE for later runs"""
+    if sizer is None or sizer.transactions == 0:
         return
+    logger.info(f"Batch size for {stage} settled at {sizer.size} rows "
+                f"({sizer.seconds / sizer.transactions:.2f} s per transaction)")
+    with BATCH_SIZES_LOCK:
+        LEARNED_BATCH_SIZES[stage] = sizer.size
+        tmp = BATCH_SIZES_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(LEARNED_BATCH_SIZES, f, indent=2, sort_keys=True)
+        os.replace(tmp, BATCH_SIZES_FILE)
+
+def load_batch_sizes():
+    """Batch sizes learned by previous runs"""
+    if not os.path.exists(BATCH_SIZES_FILE):
+        return {}
+    try:
+        with open(BATCH_SIZES_FILE) as f:
+            return {stage: int(size) for stage, size in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring {BATCH_SIZES_FILE}: {e}")
+        return {}
+
+def payload_bytes(records):
+    """Rough size of a batch parameter, extrapolated from its first records"""
+    sample = records[:PAYLOAD_SAMPLE]
+    return len(json.dumps(sample, default=str)) * len(records) // max(len(sample), 1)
+
+def is_memory_error(error):
+    """True for the transaction and memory pool limits of the server"""
+    return isinstance(error, Neo4jError) and "Memory" in (error.code or "")
+
+class BatchTooLarge(Exception):
+    """A batch exceeded the server memory limits.
     
-    total_records = len(data)
-    processed = 0
-    start_time = time.time()
+    Memory errors are transient, so the driver would resend the same batch until its
+    retry time runs out; raised instead of them inside the transaction function, this
+    stops the retries and lets the batch be split on the first failure.
+    """
     
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+def write_batch(tx, query, records):
+    """Run a batched UNWIND query inside a managed write transaction"""
     try:
-        for batch in batch_process(data, batch_size):            
-            # Convert batch to list of dictionaries for parameters
-            records = batch.to_dict('records')
-            
-            # Create a parameterized Cypher query for the batch
-            with driver.session() as session:
-                # UNWIND is much more efficient for batch operations
-                params = {
-                    'batch': records
-                }
-                
-                query = f"""
-                UNWIND $batch AS row
-                CREATE (n:{label})
-                SET n = row
-                """
-                
-                result = session.run(query, params)
-                processed += len(batch)
-                
-                if processed % (batch_size * 5) == 0 or processed == total_records:
-                    logger.info(f"Created {processed}/{total_records} {label} nodes ({processed/total_records*100:.1f}%)")
-        
-        # Verify insertion
+        return tx.run(query, batch=records).consume()
+    except Neo4jError as e:
+        if is_memory_error(e):
+            raise BatchTooLarge(e) from e
+        raise
+
+def run_batch(session, query, records, metrics=None, sizer=None):
+    """Write one batch, recording retried attempts and server counters in the stage metrics.
+    
+    With a sizer the commit time tunes the batch size, and a batch that exceeds the
+    server memory limits is split in two.
+    """
+    attempts = 0
+    
+    def work(tx):
+        nonlocal attempts
+        attempts += 1
+        return write_batch(tx, query, records)
+    
+    start_time = time.perf_counter()
+    try:
+        summary = session.execute_write(work)
+    except BatchTooLarge as e:
+        return add_counters([run_batch(session, query, half, metrics, sizer)
+                             for half in split_batch(e.error, records, sizer)])
+    
+    return batch_written(records, summary, attempts, time.perf_counter() - start_time, metrics, sizer)
+
+def split_batch(error, records, sizer):
+    """The two halves of a batch that exceeded the server memory limits; re-raises the error if it cannot be split"""
+    if sizer is None or len(records) < 2 or not is_memory_error(error):
+        raise error
+    sizer.shrink()
+    logger.warning(f"Batch of {len(records)} rows exceeded server memory, splitting it")
+    half = len(records) // 2
+    return records[:half], records[half:]
+
+def add_counters(counters):
+    """Sum the server counters of the parts of a split batch"""
+    return {name: sum(part[name] for part in counters) for name in counters[0]}
+
+def batch_written(records, summary, attempts, seconds, metrics=None, sizer=None):
+    """Record a committed batch in the sizer and the stage metrics; returns its server counters"""
+    counters = summary_counters(summary)
+    if sizer:
+        sizer.observe(len(records), seconds, payload_bytes(records))
+    if metrics:
+        metrics.batch_committed(len(records), attempts - 1, counters)
+    return counters
+
+def execute_batches(driver, query, batches, workers=1, metrics=None, sizer=None):
+    """Run the query once per (offset, records) batch and yield (offset, records, server counters)
+    as batches commit.
+    
+    With workers > 1 the batches are spread over a pool of sessions. Managed write
+    transactions retry transient errors (deadlocks included) automatically. With the
+    async backend the batches go through ASYNC_LOADER, with workers transactions in flight.
+    """
+    if ASYNC_LOADER is not None:
+        yield from ASYNC_LOADER.execute_batches(query, batches, workers, metrics, sizer)
+        return
+    
+    if workers <= 1:
         with driver.session() as session:
-            result = session.run(f"MATCH (n:{label}) RETURN count(n) AS count")
-            db_count = result.single()["count"]
-            logger.info(f"Completed: {total_records} {label} nodes processed, {db_count} found in database")
+            for offset, records in batches:
+                yield offset, records, run_batch(session, query, records, metrics, sizer)
+        return
+    
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+    
+    def run(offset, records):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = driver.session()
+            with sessions_lock:
+                sessions.append(session)
+        return offset, records, run_batch(session, query, records, metrics, sizer)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for offset, records in batches:
+                # Keep a bounded number of batches in flight so memory does not grow with the input
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(run, offset, records))
             
+            for future in pending:
+                yield future.result()
+    finally:
+        for session in sessions:
+            session.close()
+
+class AsyncLoader:
+    """Write engine on the async driver, with its event loop running in a background thread.
+    
+    A producer prepares batches in a worker thread and feeds a bounded queue, from which
+    in_flight sessions run write transactions. A full queue pauses the producer, and
+    committed batches wait for the caller in at most queue_size result slots, so memory
+    stays bounded on both sides while preparation and server execution overlap.
+    """
+    
+    _DONE = object()
+    
+    def __init__(self, uri=URI, auth=AUTH, queue_size=ASYNC_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="neo4j-async", daemon=True)
+        self.thread.start()
+        self.driver = self.call(self._connect(uri, auth))
+    
+    def call(self, coro):
+        """Run a coroutine on the loader loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+    
+    async def _connect(self, uri, auth):
+        driver = AsyncGraphDatabase.driver(uri, auth=auth)
+        await driver.verify_connectivity()
+        return driver
+    
+    def close(self):
+        self.call(self.driver.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+    
+    def execute_batches(self, query, batches, in_flight=1, metrics=None, sizer=None):
+        """Same contract as execute_batches: yield (offset, records, server counters) as batches commit"""
+        results = queue.Queue()
+        # A consumer takes a slot before handing over a committed batch, the caller frees it
+        # once the batch is processed; the end marker needs no slot, so it never blocks
+        slots = asyncio.Semaphore(self.queue_size)
+        future = asyncio.run_coroutine_threadsafe(
+            self._pipeline(query, batches, max(in_flight, 1), metrics, sizer, results, slots), self.loop)
+        try:
+            while True:
+                item = results.get()
+                if item is self._DONE:
+                    break
+                yield item
+                self.loop.call_soon_threadsafe(slots.release)
+            future.result()
+        finally:
+            future.cancel()
+    
+    async def _pipeline(self, query, batches, in_flight, metrics, sizer, results, slots):
+        pending = asyncio.Queue(maxsize=self.queue_size)
+        
+        async def produce():
+            # Batches are built in a worker thread, so the loop keeps serving transactions
+            while True:
+                item = await asyncio.to_thread(next, batches, None)
+                if item is None:
+                    break
+                await pending.put(item)
+            for _ in range(in_flight):
+                await pending.put(None)
+        
+        async def consume():
+            async with self.driver.session() as session:
+                while True:
+                    item = await pending.get()
+                    if item is None:
+                        return
+                    offset, records = item
+                    counters = await self._write(session, query, records, metrics, sizer)
+                    await slots.acquire()
+                    results.put((offset, records, counters))
+        
+        try:
+            tasks = [asyncio.ensure_future(produce())]
+            tasks += [asyncio.ensure_future(consume()) for _ in range(in_flight)]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+        finally:
+            results.put(self._DONE)
+    
+    @classmethod
+    async def _write(cls, session, query, records, metrics, sizer):
+        """Async counterpart of run_batch"""
+        attempts = 0
+        
+        async def work(tx):
+            nonlocal attempts
+            attempts += 1
+            try:
+                result = await tx.run(query, batch=records)
+                return await result.consume()
+            except Neo4jError as e:
+                if is_memory_error(e):
+                    raise BatchTooLarge(e) from e
+                raise
+        
+        start_time = time.perf_counter()
+        try:
+            summary = await session.execute_write(work)
+        except BatchTooLarge as e:
+            return add_counters([await cls._write(session, query, half, metrics, sizer)
+                                 for half in split_batch(e.error, records, sizer)])
+        
+        return batch_written(records, summary, attempts, time.perf_counter() - start_time, metrics, sizer)
+
+def build_node_records(batch):
+    """Build the node parameter list column-wise, with native temporal values.
+    
+    Missing values are sent as null, so SET n = row leaves those properties unset.
+    """
+    columns = {col: column_values(batch[col]) for col in batch.columns}
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+def create_nodes(driver, label, data, id_field='id', batch_size=None,
+                 stage=None, checkpoint=None):
+    """Create nodes in batches using efficient Cypher.
+    
+    With a checkpoint, committed batches are recorded under the stage name and rows
+    committed by a previous run are skipped. Returns False if the import failed.
+    """
+    if data is None or (isinstance(data, pd.DataFrame) and len(data) == 0):
+        logger.warning(f"No {label} data to insert")
+        return True
+    
+    batch_size = batch_size or BATCH_SIZE
+    # The total is unknown until a stream has been consumed
+    total_records = len(data) if isinstance(data, pd.DataFrame) else None
+    skip = checkpoint.offset(stage) if checkpoint else 0
+    processed = skip
+    created = 0
+    start_time = time.time()
+    
+    # UNWIND is much more efficient for batch operations
+    if MERGE_MODE:
+        # Backed by the id uniqueness constraint
+        query = f"""
+        UNWIND $batch AS row
+        MERGE (n:{label} {{{id_field}: row.{id_field}}})
+        SET n += row
+        """
+    else:
+        query = f"""
+        UNWIND $batch AS row
+        CREATE (n:{label})
+        SET n = row
+        """
+    
+    if skip:
+        logger.info(f"Resuming {label} nodes after {skip} committed rows")
+    
+    # Ids of the label, kept for the relationship stages unless rows were skipped
+    id_chunks = [] if skip == 0 else None
+    
+    sizer = batch_sizer(stage or label, batch_size)
+    
+    def build_batches():
+        for offset, batch in iter_batches(data, sizer or batch_size, skip=skip):
+            if id_chunks is not None:
+                id_chunks.append(batch[id_field].to_numpy(dtype=np.int64))
+            # Convert each batch to a list of dictionaries for parameters
+            yield offset, build_node_records(batch)
+    
+    try:
+        batches = build_batches()
+        
+        metrics = METRICS.stage(stage or label) if METRICS else None
+        for offset, records, counters in execute_batches(driver, query, batches, metrics=metrics, sizer=sizer):
+            processed += len(records)
+            created += counters["nodes_created"]
+            if checkpoint:
+                checkpoint.batch_committed(stage, offset, len(records))
+            log_progress(processed, total_records, f"{label} nodes", batch_size, len(records))
+        remember_batch_size(stage or label, sizer)
+        
+        if processed == 0:
+            logger.warning(f"No {label} data to insert")
+            return True
+        total_records = processed
+        if id_chunks is not None:
+            register_node_ids(label, id_chunks)
+        
+        elapsed = time.time() - start_time
+        logger.info(f"Wrote {processed - skip} {label} nodes in {elapsed:.2f} seconds "
+                    f"({(processed - skip) / max(elapsed, 1e-9):.0f} rows/s)")
+        
+        # Verify insertion from the summary counters, without scanning the label
+        logger.info(f"Completed: {total_records} {label} nodes processed, {created} created")
+        if created < processed - skip and not MERGE_MODE:
+            logger.warning(f"{processed - skip - created} {label} rows did not create a node")
             
     except Exception as e:
         logger.error(f"Error creating {label} nodes: {e}")
+        return False
+    
+    return True
+
+def register_node_ids(label, id_chunks):
+    """Store the sorted ids of a label created by this run"""
+    ids = np.sort(np.concatenate(id_chunks))
+    with NODE_ID_INDEX_LOCK:
+        NODE_ID_INDEX[label] = ids
+    logger.info(f"Indexed {len(ids)} {label} ids ({ids.nbytes / 1024 / 1024:.1f} MB)")
+
+def node_id_index(label):
+    """Sorted ids of a label, read from its node files when this run did not create them all"""
+    with NODE_ID_INDEX_LOCK:
+        if label not in NODE_ID_INDEX:
+            id_chunks = []
+            for spec in NODE_IMPORTS:
+                if spec["label"] != label:
+                    continue
+                # Only the ids and the column the import filters on
+                data = load_csv_data(spec["path"], stream=False, usecols=["id", *spec.get("where", ())[:1]])
+                if data is None:
+                    return None
+                if "where" in spec:
+                    column, value = spec["where"]
+                    data = data[data[column] == value]
+                id_chunks.append(data["id"].to_numpy(dtype=np.int64))
+            if not id_chunks:
+                return None
+            NODE_ID_INDEX[label] = np.sort(np.concatenate(id_chunks))
+        return NODE_ID_INDEX[label]
+
+def known_ids(index, ids):
+    """Boolean mask of the ids present in a sorted id array"""
+    if len(index) == 0:
+        return np.zeros(len(ids), dtype=bool)
+    positions = np.minimum(np.searchsorted(index, ids), len(index) - 1)
+    return index[positions] == ids
+
+def find_dangling_rows(driver, start_label, end_label, records):
+    """Count the rows of a batch whose start or end node does not exist, with a few examples"""
+    query = f"""
+    UNWIND $batch AS row
+    OPTIONAL MATCH (a:{start_label} {{id: row.start_id}})
+    OPTIONAL MATCH (b:{end_label} {{id: row.end_id}})
+    WITH row, a, b
+    WHERE a IS NULL OR b IS NULL
+    RETURN count(*) AS missing,
+           collect(CASE WHEN a IS NULL THEN '{start_label} ' + toString(row.start_id)
+                        ELSE '{end_label} ' + toString(row.end_id) END)[..$samples] AS samples
+    """
+    with driver.session() as session:
+        record = session.execute_read(
+            lambda tx: tx.run(query, batch=records, samples=DANGLING_SAMPLES).single())
+    return record["missing"], record["samples"]
+
+def partition_by_start_id(data, start_id_field):
+    """Order rows by start node id so that every batch covers a disjoint id range"""
+    return data.sort_values(start_id_field, kind="stable")
+
+def build_relationship_records(batch, start_id_field, end_id_field, props=None):
+    """Build the relationship parameter list column-wise from a DataFrame slice"""
+    # Extract only needed columns to reduce memory usage
+    columns = {
+        'start_id': batch[start_id_field].to_numpy(dtype='int64').tolist(),
+        'end_id': batch[end_id_field].to_numpy(dtype='int64').tolist()
+    }
+    
+    # Missing properties are sent as null, which SET skips on a new relationship
+    if props:
+        for prop, field in props.items():
+            if field in batch.columns:
+                columns[prop] = column_values(batch[field])
+    
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
 
 def create_relationships(driver, start_label, rel_type, end_label, data, 
-                        start_id_field, end_id_field, props=None, batch_size=BATCH_SIZE):
-    """Create relationships in batches using efficient Cypher"""
-    if data is None or len(data) == 0:
+                        start_id_field, end_id_field, props=None, batch_size=None,
+                        workers=None, stage=None, checkpoint=None):
+    """Create relationships in batches using efficient Cypher.
+    
+    Checkpointing works as in create_nodes. Returns False if the import failed.
+    """
+    if data is None or (isinstance(data, pd.DataFrame) and len(data) == 0):
         logger.warning(f"No {rel_type} relationship data to insert")
-        return
+        return True
     
-    total_records = len(data)
-    processed = 0
+    workers = workers or WORKERS
+    batch_size = batch_size or BATCH_SIZE
+    total_records = len(data) if isinstance(data, pd.DataFrame) else None
+    skip = checkpoint.offset(stage) if checkpoint else 0
+    processed = skip
+    created = 0
+    missing = 0
+    samples = []
     start_time = time.time()
     
+    prop_set = ""
+    if props:
+        # Prepare dynamic property setting for relationships
+        prop_fields = []
+        for prop in props.keys():
+            prop_fields.append(f"r.{prop} = row.{prop}")
+        
+        if prop_fields:
+            prop_set = "SET " + ", ".join(prop_fields)
+    
+    query = f"""
+    UNWIND $batch AS row
+    MATCH (a:{start_label} {{id: row.start_id}}), (b:{end_label} {{id: row.end_id}})
+    {"MERGE" if MERGE_MODE else "CREATE"} (a)-[r:{rel_type}]->(b)
+    {prop_set}
+    """
+    
+    # Rows pointing at ids that were never loaded are dropped before batching
+    start_index = node_id_index(start_label) if FILTER_ENDPOINTS else None
+    end_index = node_id_index(end_label) if FILTER_ENDPOINTS else None
+    rejected = {"start": 0, "end": 0}
+    
+    def prepare(chunk):
+        if start_index is not None and end_index is not None:
+            start_known = known_ids(start_index, chunk[start_id_field].to_numpy(dtype=np.int64))
+            end_known = known_ids(end_index, chunk[end_id_field].to_numpy(dtype=np.int64))
+            rejected["start"] += int((~start_known).sum())
+            rejected["end"] += int((start_known & ~end_known).sum())
+            if not (start_known & end_known).all():
+                chunk = chunk[start_known & end_known]
+        # Concurrent batches touching the same start nodes would contend for their locks
+        if workers > 1:
+            chunk = partition_by_start_id(chunk, start_id_field)
+        return chunk
+    
+    stage_name = stage or f"{start_label}_{rel_type}_{end_label}"
+    sizer = batch_sizer(stage_name, batch_size)
+    
+    def build_batches():
+        for offset, batch in iter_batches(data, sizer or batch_size, prepare, skip=skip):
+            yield offset, build_relationship_records(batch, start_id_field, end_id_field, props)
+    
+    if skip:
+        logger.info(f"Resuming {rel_type} relationships after {skip} committed rows")
+    
     try:
-        for batch in batch_process(data, batch_size):
-            # Create a parameterized Cypher query for the batch
-            records = []
-            
-            # Extract only needed columns to reduce memory usage
-            for _, row in batch.iterrows():
-                record = {
-                    'start_id': int(row[start_id_field]),
-                    'end_id': int(row[end_id_field])
-                }
-                
-                # Add any properties to the relationship
-                if props:
-                    for prop, field in props.items():
-                        if field in row and row[field] != "":
-                            record[prop] = row[field]
-                
-                records.append(record)
-            
-            # Execute the query
-            with driver.session() as session:
-                params = {'batch': records}
-                
-                prop_set = ""
-                if props:
-                    # Prepare dynamic property setting for relationships
-                    prop_fields = []
-                    for prop in props.keys():
-                        prop_fields.append(f"r.{prop} = row.{prop}")
-                    
-                    if prop_fields:
-                        prop_set = "SET " + ", ".join(prop_fields)
-                
-                query = f"""
-                UNWIND $batch AS row
-                MATCH (a:{start_label} {{id: row.start_id}}), (b:{end_label} {{id: row.end_id}})
-                CREATE (a)-[r:{rel_type}]->(b)
-                {prop_set}
-                """
-                
-                session.run(query, params)
-                processed += len(batch)
-                
-                if processed % (batch_size * 5) == 0 or processed == total_records:
-                    logger.info(f"Created {processed}/{total_records} {rel_type} relationships ({processed/total_records*100:.1f}%)")
+        metrics = METRICS.stage(stage_name) if METRICS else None
+        for offset, records, counters in execute_batches(driver, query, build_batches(), workers, metrics, sizer):
+            processed += len(records)
+            created += counters["relationships_created"]
+            if checkpoint:
+                checkpoint.batch_committed(stage, offset, len(records))
+            # Only batches that created fewer edges than rows are checked for missing endpoints
+            if counters["relationships_created"] < len(records):
+                batch_missing, batch_samples = find_dangling_rows(driver, start_label, end_label, records)
+                missing += batch_missing
+                samples.extend(batch_samples[:DANGLING_SAMPLES - len(samples)])
+            log_progress(processed, total_records, f"{rel_type} relationships", batch_size, len(records))
+        remember_batch_size(stage_name, sizer)
         
-        # Verify insertion
-        with driver.session() as session:
-            result = session.run(f"MATCH ()-[r:{rel_type}]->() RETURN count(r) AS count")
-            db_count = result.single()["count"]
-            logger.info(f"Completed: {total_records} {rel_type} relationships processed, {db_count} found in database")
-            
+        if rejected["start"] or rejected["end"]:
+            logger.warning(f"Filtered out {rejected['start'] + rejected['end']} {rel_type} rows with unknown ids "
+                           f"({rejected['start']} {start_label}, {rejected['end']} {end_label})")
+            if metrics:
+                metrics.add_counter("rows_rejected", rejected["start"] + rejected["end"])
+        
+        if processed == 0:
+            logger.warning(f"No {rel_type} relationship data to insert")
+            return True
+        total_records = processed
+        
+        elapsed = time.time() - start_time
+        logger.info(f"Wrote {processed - skip} {rel_type} relationships in {elapsed:.2f} seconds "
+                    f"({(processed - skip) / max(elapsed, 1e-9):.0f} rows/s, {workers} workers)")
+        
+        # Verify insertion from the summary counters, without scanning the relationship type
+        logger.info(f"Completed: {total_records} {rel_type} relationships processed, {created} created")
+        if missing:
+            logger.warning(f"{missing} {rel_type} rows matched no {start_label} or {end_label} node "
+                           f"and were skipped, e.g. {', '.join(samples)}")
+            if metrics:
+                metrics.add_counter("rows_without_endpoint", missing)
             
     except Exception as e:
         logger.error(f"Error creating {rel_type} relationships: {e}")
-
-def import_person_data(driver):
-    """Import person data"""
-    person_path = "test/dynamic/person_0_0.csv"
-    person_data = load_csv_data(person_path)
-    
-    if person_data is not None:
-        # Process date columns
-        person_data = process_datetime_fields(person_data, ['birthday', 'creationDate'])
-        # Handle missing values
-        person_data = person_data.fillna("")
-        # Create nodes
-        create_nodes(driver, "Person", person_data)
-    else:
-        logger.error(f"Failed to process person data from {person_path}")
         return False
     
     return True
 
-def import_tag_data(driver):
-    """Import tag data"""
-    tag_path = "test/static/tag_0_0.csv"
-    tag_data = load_csv_data(tag_path)
-    
-    if tag_data is not None:
-        # Handle missing values
-        tag_data = tag_data.fillna("")
-        # Create nodes
-        create_nodes(driver, "Tag", tag_data)
-    else:
-        logger.error(f"Failed to process tag data from {tag_path}")
-        return False
-    
-    return True
+# Import manifest: every entry below is one stage of the load. Node stages are
+# independent of each other, a relationship stage depends on its two endpoint labels.
 
-def import_knows_relationships(driver):
-    """Import knows relationships"""
-    knows_path = "test/dynamic/person_knows_person_0_0.csv"
-    knows_data = load_csv_data(knows_path)
-    
-    if knows_data is not None:
-        # Process date columns
-        knows_data = process_datetime_fields(knows_data, ['creationDate'])
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Person", "KNOWS", "Person", 
-            knows_data,
-            "Person.id", "Person.id.1",
-            props={"creationDate": "creationDate"}
-        )
-    else:
-        logger.error(f"Failed to process knows relationships from {knows_path}")
-        return False
+# Node imports: CSV file -> label, with the preprocessing applied to each file
+NODE_IMPORTS = [
+    {"label": "Person", "path": "test/dynamic/person_0_0.csv"},
+    {"label": "Tag", "path": "test/static/tag_0_0.csv"},
+    # Only keep id column
+    {"label": "Comment", "path": "test/dynamic/comment_0_0.csv", "columns": ["id"]},
+    {"label": "Forum", "path": "test/dynamic/forum_0_0.csv"},
+    {"label": "Post", "path": "test/dynamic/post_0_0.csv", "columns": ["id"]},
+    # Organisations are split into Universities and Companies by type
+    {"label": "University", "path": "test/static/organisation_0_0.csv",
+     "columns": ["id", "type"], "where": ("type", "university")},
+    {"label": "Company", "path": "test/static/organisation_0_0.csv",
+     "columns": ["id", "type"], "where": ("type", "company")},
+]
+
+# Relationship imports: CSV file -> (start label)-[type]->(end label)
+RELATIONSHIP_IMPORTS = [
+    {"type": "KNOWS", "start_label": "Person", "end_label": "Person",
+     "path": "test/dynamic/person_knows_person_0_0.csv",
+     "start_id_field": "Person.id", "end_id_field": "Person.id.1",
+     "props": {"creationDate": "creationDate"}},
+    {"type": "INTEREST", "start_label": "Person", "end_label": "Tag",
+     "path": "test/dynamic/person_hasInterest_tag_0_0.csv",
+     "start_id_field": "Person.id", "end_id_field": "Tag.id"},
+    {"type": "LIKES_COMMENT", "start_label": "Person", "end_label": "Comment",
+     "path": "test/dynamic/person_likes_comment_0_0.csv",
+     "start_id_field": "Person.id", "end_id_field": "Comment.id"},
+    {"type": "MEMBER", "start_label": "Person", "end_label": "Forum",
+     "path": "test/dynamic/forum_hasMember_person_0_0.csv",
+     "start_id_field": "Person.id", "end_id_field": "Forum.id",
+     "props": {"joinDate": "joinDate"}},
+    {"type": "MODERATOR", "start_label": "Forum", "end_label": "Person",
+     "path": "test/dynamic/forum_hasModerator_person_0_0.csv",
+     "start_id_field": "Forum.id", "end_id_field": "Person.id"},
+    {"type": "HAS_TAG", "start_label": "Forum", "end_label": "Tag",
+     "path": "test/dynamic/forum_hasTag_tag_0_0.csv",
+     "start_id_field": "Forum.id", "end_id_field": "Tag.id"},
+    {"type": "LIKES_POST", "start_label": "Person", "end_label": "Post",
+     "path": "test/dynamic/person_likes_post_0_0.csv",
+     "start_id_field": "Person.id", "end_id_field": "Post.id"},
+    {"type": "TAGGED", "start_label": "Comment", "end_label": "Tag",
+     "path": "test/dynamic/comment_hasTag_tag_0_0.csv",
+     "start_id_field": "Comment.id", "end_id_field": "Tag.id"},
+    {"type": "TAGGED", "start_label": "Post", "end_label": "Tag",
+     "path": "test/dynamic/post_hasTag_tag_0_0.csv",
+     "start_id_field": "Post.id", "end_id_field": "Tag.id"},
+    {"type": "WORK_AT", "start_label": "Person", "end_label": "Company",
+     "path": "test/dynamic/person_workAt_organisation_0_0.csv",
+     "start_id_field": "Person.id", "end_id_field": "Organisation.id",
+     "props": {"workFrom": "workFrom"}},
+    {"type": "STUDY_AT", "start_label": "Person", "end_label": "University",
+     "path": "test/dynamic/person_studyAt_organisation_0_0.csv",
+     "start_id_field": "Person.id", "end_id_field": "Organisation.id",
+     "props": {"classYear": "classYear"}},
+    {"type": "HAS_CREATOR_COMMENT", "start_label": "Comment", "end_label": "Person",
+     "path": "test/dynamic/comment_hasCreator_person_0_0.csv",
+     "start_id_field": "Comment.id", "end_id_field": "Person.id"},
+    {"type": "HAS_CREATOR_POST", "start_label": "Post", "end_label": "Person",
+     "path": "test/dynamic/post_hasCreator_person_0_0.csv",
+     "start_id_field": "Post.id", "end_id_field": "Person.id"},
+]
+
+# Materialized analytics: aggregates read by the GUI dashboards (queryAnalitica1-3), stored
+# as properties once their input relationships are loaded. Each query updates its target
+# nodes in transactions of MATERIALIZE_BATCH_SIZE nodes.
+MATERIALIZATIONS = [
+    # Likes on posts between people who studied at the same university
+    {"name": "University_coLikeCount",
+     "depends_on": ["Post_HAS_CREATOR_POST_Person", "Person_LIKES_POST_Post", "Person_STUDY_AT_University"],
+     "query": f"""
+     MATCH (university:University)
+     CALL {{
+         WITH university
+         OPTIONAL MATCH (creator:Person)-[:STUDY_AT]->(university)<-[:STUDY_AT]-(liker:Person),
+                        (creator)<-[:HAS_CREATOR_POST]-(:Post)<-[:LIKES_POST]-(liker)
+         WITH university, count(liker) AS likes
+         SET university.coLikeCount = likes
+     }} IN TRANSACTIONS OF {MATERIALIZE_BATCH_SIZE} ROWS
+     """},
+    # Average age of the people known by each forum moderator; ages are relative to avgKnownAgeAsOf
+    {"name": "Person_avgKnownAge",
+     "depends_on": ["Forum_MODERATOR_Person", "Person_KNOWS_Person"],
+     "query": f"""
+     MATCH (:Forum)-[:MODERATOR]->(moderator:Person)
+     WITH DISTINCT moderator
+     CALL {{
+         WITH moderator
+         OPTIONAL MATCH (moderator)-[:KNOWS]->(known:Person)
+         WHERE known.birthday IS NOT NULL
+         WITH moderator, avg(duration.between(known.birthday, date()).years) AS avgAge, count(known) AS knownCount
+         SET moderator.avgKnownAge = avgAge, moderator.knownCount = knownCount,
+             moderator.avgKnownAgeAsOf = date()
+     }} IN TRANSACTIONS OF {MATERIALIZE_BATCH_SIZE} ROWS
+     """},
+    # Most common gender among the people interested in each tag
+    {"name": "Tag_dominantGender",
+     "depends_on": ["Person_INTEREST_Tag"],
+     "query": f"""
+     MATCH (tag:Tag)
+     CALL {{
+         WITH tag
+         OPTIONAL MATCH (person:Person)-[:INTEREST]->(tag)
+         WHERE person.gender IS NOT NULL
+         WITH tag, person.gender AS gender, count(person) AS count
+         ORDER BY count DESC
+         WITH tag, [entry IN collect({{gender: gender, count: count}}) WHERE entry.count > 0] AS genderCounts,
+              sum(count) AS totalCount
+         SET tag.dominantGender = genderCounts[0].gender,
+             tag.dominantGenderCount = genderCounts[0].count,
+             tag.dominanceRatio = CASE WHEN totalCount > 0 THEN toFloat(genderCounts[0].count) / totalCount END,
+             tag.genderCount = size(genderCounts)
+     }} IN TRANSACTIONS OF {MATERIALIZE_BATCH_SIZE} ROWS
+     """},
+]
+
+def node_columns(spec):
+    """CSV columns read by a node import, None for all of them"""
+    if "columns" not in spec:
+        return None
+    return list(dict.fromkeys([*spec["columns"], *spec.get("where", ())[:1]]))
+
+def relationship_columns(spec):
+    """CSV columns read by a relationship import: both endpoints and the mapped properties"""
+    return [spec["start_id_field"], spec["end_id_field"], *(spec.get("props") or {}).values()]
+
+def prepare_node_frame(df, spec):
+    """Apply the filtering and column selection of a node import"""
+    if "where" in spec:
+        column, value = spec["where"]
+        df = df[df[column] == value]
+    if "columns" in spec:
+        df = df[spec["columns"]]
+    return df
+
+def node_labels():
+    """Node labels created by the import, in import order"""
+    return list(dict.fromkeys(spec["label"] for spec in NODE_IMPORTS))
+
+def create_indices(driver):
+    """Create a uniqueness constraint on id for every imported label and wait for it to come online"""
+    with driver.session() as session:
+        for label in node_labels():
+            # The constraint is backed by a range index used by the MATCH on id
+            session.run(f"CREATE CONSTRAINT {label.lower()}_id_unique IF NOT EXISTS "
+                        f"FOR (n:{label}) REQUIRE n.id IS UNIQUE").consume()
+    logger.info(f"Ensured id constraints for {', '.join(node_labels())}")
+    wait_for_indexes(driver)
+
+def wait_for_indexes(driver, timeout=INDEX_TIMEOUT):
+    """Block until every index in the database is ONLINE"""
+    start_time = time.time()
+    with driver.session() as session:
+        while True:
+            pending = session.run(
+                "SHOW INDEXES YIELD name, state, populationPercent "
+                "WHERE state <> 'ONLINE' RETURN name, state, populationPercent"
+            ).data()
+            if not pending:
+                logger.info(f"All indexes online after {time.time() - start_time:.2f} seconds")
+                return
+            
+            failed = [index["name"] for index in pending if index["state"] == "FAILED"]
+            if failed:
+                raise RuntimeError(f"Index population failed: {', '.join(failed)}")
+            if time.time() - start_time > timeout:
+                raise TimeoutError(f"Indexes still not online after {timeout} seconds: "
+                                   f"{', '.join(index['name'] for index in pending)}")
+            
+            progress = ", ".join(f"{index['name']} {index['populationPercent']:.0f}%" for index in pending)
+            logger.info(f"Waiting for indexes: {progress}")
+            time.sleep(1)
+
+def drop_secondary_indexes(driver):
+    """Drop the indexes not owned by a constraint and return the statements to recreate them"""
+    with driver.session() as session:
+        indexes = session.run(
+            "SHOW INDEXES YIELD name, type, owningConstraint, createStatement "
+            "WHERE owningConstraint IS NULL AND type <> 'LOOKUP' "
+            "RETURN name, createStatement"
+        ).data()
+        for index in indexes:
+            session.run(f"DROP INDEX `{index['name']}` IF EXISTS").consume()
     
-    return True
+    if indexes:
+        logger.info(f"Dropped {len(indexes)} secondary indexes for the bulk load")
+    return [index["createStatement"] for index in indexes]
 
-def import_interest_relationships(driver):
-    """Import interest relationships"""
-    interest_path = "test/dynamic/person_hasInterest_tag_0_0.csv"
-    interest_data = load_csv_data(interest_path)
-    
-    if interest_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Person", "INTEREST", "Tag", 
-            interest_data,
-            "Person.id", "Tag.id"
-        )
-    else:
-        logger.error(f"Failed to process interest relationships from {interest_path}")
-        return False
+def rebuild_secondary_indexes(driver, statements):
+    """Recreate indexes dropped by drop_secondary_indexes and wait for them to populate"""
+    if not statements:
+        return
     
-    return True
+    start_time = time.time()
+    with driver.session() as session:
+        for statement in statements:
+            session.run(statement).consume()
+    wait_for_indexes(driver)
+    logger.info(f"Rebuilt {len(statements)} secondary indexes in {time.time() - start_time:.2f} seconds")
 
-def import_comment_data(driver):
-    """Import comment data"""
-    comment_path = "test/dynamic/comment_0_0.csv"
-    comment_data = load_csv_data(comment_path)
+def import_nodes(driver, spec, checkpoint=None):
+    """Import the nodes described by a NODE_IMPORTS entry"""
+    data = load_csv_data(spec["path"], usecols=node_columns(spec))
     
-    if comment_data is not None:
-        # Only keep id column
-        comment_data = comment_data[["id"]].fillna("")
-        # Create nodes
-        create_nodes(driver, "Comment", comment_data)
-    else:
-        logger.error(f"Failed to process comment data from {comment_path}")
+    if data is None:
+        logger.error(f"Failed to process {spec['label']} data from {spec['path']}")
         return False
     
-    return True
+    return create_nodes(driver, spec["label"], map_frames(data, lambda df: prepare_node_frame(df, spec)),
+                        stage=spec["label"], checkpoint=checkpoint)
 
-def import_likes_comment_relationships(driver):
-    """Import likes comment relationships"""
-    likes_comment_path = "test/dynamic/person_likes_comment_0_0.csv"
-    likes_comment_data = load_csv_data(likes_comment_path)
-    
-    if likes_comment_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Person", "LIKES_COMMENT", "Comment", 
-            likes_comment_data,
-            "Person.id", "Comment.id"
-        )
-    else:
-        logger.error(f"Failed to process likes comment relationships from {likes_comment_path}")
-        return False
+def import_relationships(driver, spec, checkpoint=None):
+    """Import the relationships described by a RELATIONSHIP_IMPORTS entry"""
+    data = load_csv_data(spec["path"], usecols=relationship_columns(spec))
     
-    return True
-
-def import_forum_data(driver):
-    """Import forum data"""
-    forum_path = "test/dynamic/forum_0_0.csv"
-    forum_data = load_csv_data(forum_path)
-    
-    if forum_data is not None:
-        # Process date columns
-        forum_data = process_datetime_fields(forum_data, ['creationDate'])
-        # Handle missing values
-        forum_data = forum_data.fillna("")
-        # Create nodes
-        create_nodes(driver, "Forum", forum_data)
-    else:
-        logger.error(f"Failed to process forum data from {forum_path}")
+    if data is None:
+        logger.error(f"Failed to process {spec['type']} relationships from {spec['path']}")
         return False
     
-    return True
+    return create_relationships(
+        driver,
+        spec["start_label"], spec["type"], spec["end_label"],
+        data,
+        spec["start_id_field"], spec["end_id_field"],
+        props=spec.get("props"),
+        stage=relationship_stage_name(spec), checkpoint=checkpoint
+    )
 
-def import_forum_member_relationships(driver):
-    """Import forum member relationships"""
-    member_path = "test/dynamic/forum_hasMember_person_0_0.csv"
-    member_data = load_csv_data(member_path)
-    
-    if member_data is not None:
-        # Process date columns
-        member_data = process_datetime_fields(member_data, ['joinDate'])
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Person", "MEMBER", "Forum", 
-            member_data,
-            "Person.id", "Forum.id",
-            props={"joinDate": "joinDate"}
-        )
-    else:
-        logger.error(f"Failed to process forum member relationships from {member_path}")
+def materialize(driver, spec, checkpoint=None):
+    """Run a MATERIALIZATIONS entry; it recomputes every target node, so reruns are safe"""
+    start_time = time.time()
+    try:
+        # CALL ... IN TRANSACTIONS needs an auto-commit transaction
+        with driver.session() as session:
+            counters = summary_counters(session.run(spec["query"]).consume())
+    except Neo4jError as e:
+        logger.error(f"Error materializing {spec['name']}: {e}")
         return False
     
+    if METRICS:
+        METRICS.stage(spec["name"]).batch_committed(0, counters=counters)
+    logger.info(f"Materialized {spec['name']}: {counters['properties_set']} properties set "
+                f"in {time.time() - start_time:.2f} seconds")
     return True
 
-def import_forum_moderator_relationships(driver):
-    """Import forum moderator relationships"""
-    moderator_path = "test/dynamic/forum_hasModerator_person_0_0.csv"
-    moderator_data = load_csv_data(moderator_path)
-    
-    if moderator_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Forum", "MODERATOR", "Person", 
-            moderator_data,
-            "Forum.id", "Person.id"
-        )
-    else:
-        logger.error(f"Failed to process forum moderator relationships from {moderator_path}")
-        return False
-    
-    return True
+def relationship_stage_name(spec):
+    """Unique stage name of a relationship import (the same type can come from several files)"""
+    return f"{spec['start_label']}_{spec['type']}_{spec['end_label']}"
 
-def import_forum_tag_relationships(driver):
-    """Import forum tag relationships"""
-    tag_forum_path = "test/dynamic/forum_hasTag_tag_0_0.csv"
-    tag_forum_data = load_csv_data(tag_forum_path)
-    
-    if tag_forum_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Forum", "HAS_TAG", "Tag", 
-            tag_forum_data,
-            "Forum.id", "Tag.id"
-        )
-    else:
-        logger.error(f"Failed to process forum tag relationships from {tag_forum_path}")
-        return False
+def build_stages():
+    """Build the stage DAG from the import manifest.
     
-    return True
-
-def import_post_data(driver):
-    """Import post data"""
-    post_path = "test/dynamic/post_0_0.csv"
-    post_data = load_csv_data(post_path)
+    Returns a dict of stage name -> {"run", "spec", "depends_on"}.
+    """
+    stages = {}
+    for spec in NODE_IMPORTS:
+        stages[spec["label"]] = {"run": import_nodes, "spec": spec, "depends_on": set()}
     
-    if post_data is not None:
-        # Only keep id column
-        post_data = post_data[["id"]].fillna("")
-        # Create nodes
-        create_nodes(driver, "Post", post_data)
-    else:
-        logger.error(f"Failed to process post data from {post_path}")
-        return False
+    for spec in RELATIONSHIP_IMPORTS:
+        depends_on = {spec["start_label"], spec["end_label"]}
+        missing = depends_on - stages.keys()
+        if missing:
+            raise ValueError(f"{relationship_stage_name(spec)} depends on unknown labels: {', '.join(missing)}")
+        stages[relationship_stage_name(spec)] = {"run": import_relationships, "spec": spec,
+                                                 "depends_on": depends_on}
     
-    return True
+    if MATERIALIZE:
+        for spec in MATERIALIZATIONS:
+            depends_on = set(spec["depends_on"])
+            missing = depends_on - stages.keys()
+            if missing:
+                raise ValueError(f"{spec['name']} depends on unknown stages: {', '.join(missing)}")
+            stages[spec["name"]] = {"run": materialize, "spec": spec, "depends_on": depends_on}
+    return stages
 
-def import_likes_post_relationships(driver):
-    """Import likes post relationships"""
-    likes_post_path = "test/dynamic/person_likes_post_0_0.csv"
-    likes_post_data = load_csv_data(likes_post_path)
-    
-    if likes_post_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Person", "LIKES_POST", "Post", 
-            likes_post_data,
-            "Person.id", "Post.id"
-        )
-    else:
-        logger.error(f"Failed to process likes post relationships from {likes_post_path}")
-        return False
+def run_stages(driver, stages, concurrency=STAGE_CONCURRENCY, checkpoint=None):
+    """Run every stage once its dependencies have completed, at most concurrency at a time.
     
-    return True
-
-def import_tag_comment_relationships(driver):
-    """Import tag comment relationships"""
-    tag_comment_path = "test/dynamic/comment_hasTag_tag_0_0.csv"
-    tag_comment_data = load_csv_data(tag_comment_path)
-    
-    if tag_comment_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Comment", "TAGGED", "Tag", 
-            tag_comment_data,
-            "Comment.id", "Tag.id"
-        )
-    else:
-        logger.error(f"Failed to process tag comment relationships from {tag_comment_path}")
-        return False
+    Stages completed according to the checkpoint are skipped, unless a stage they depend
+    on runs again. After a failure no new stage is started. Returns True if all stages
+    succeeded.
+    """
+    to_run = {name for name in stages if not (checkpoint and name in checkpoint.completed)}
+    # Dependents of a stage that runs again are stale, whatever the checkpoint says
+    changed = True
+    while changed:
+        stale = {name for name, stage in stages.items() if name not in to_run and stage["depends_on"] & to_run}
+        to_run |= stale
+        changed = bool(stale)
     
-    return True
-
-def import_tag_post_relationships(driver):
-    """Import tag post relationships"""
-    tag_post_path = "test/dynamic/post_hasTag_tag_0_0.csv"
-    tag_post_data = load_csv_data(tag_post_path)
-    
-    if tag_post_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Post", "TAGGED", "Tag", 
-            tag_post_data,
-            "Post.id", "Tag.id"
-        )
-    else:
-        logger.error(f"Failed to process tag post relationships from {tag_post_path}")
-        return False
+    completed = set(stages) - to_run
+    remaining = {name: stage for name, stage in stages.items() if name in to_run}
+    if completed:
+        logger.info(f"Skipping {len(completed)} stages completed by a previous run")
+    for name in remaining:
+        if checkpoint:
+            checkpoint.reopen(name)
+    failed = []
+    running = {}
+    start_time = time.time()
     
-    return True
-
-def import_organization_data(driver):
-    """Import organization data"""
-    org_path = "test/static/organisation_0_0.csv"
-    org_data = load_csv_data(org_path)
+    def run_stage(name, stage):
+        logger.info(f"Starting stage {name}")
+        stage_start = time.time()
+        metrics = METRICS.stage(name) if METRICS else None
+        # The peak RSS is process-wide: it can only be attributed to a stage running alone
+        if concurrency == 1:
+            reset_peak_rss()
+        if metrics:
+            metrics.start()
+        succeeded = stage["run"](driver, stage["spec"], checkpoint)
+        if metrics:
+            metrics.finish()
+        if succeeded:
+            if checkpoint:
+                checkpoint.stage_completed(name)
+            logger.info(f"Finished stage {name} in {time.time() - stage_start:.2f} seconds")
+        return succeeded
     
-    if org_data is not None:
-        # Filter by organization type
-        university_data = org_data[org_data["type"] == "university"][["id", "type"]]
-        company_data = org_data[org_data["type"] == "company"][["id", "type"]]
-        
-        # Create nodes
-        create_nodes(driver, "University", university_data)
-        create_nodes(driver, "Company", company_data)
-    else:
-        logger.error(f"Failed to process organization data from {org_path}")
-        return False
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            if not failed:
+                # Start ready stages in manifest order, without queueing beyond the limit
+                ready = [name for name, stage in remaining.items() if stage["depends_on"] <= completed]
+                for name in ready[:concurrency - len(running)]:
+                    running[executor.submit(run_stage, name, remaining.pop(name))] = name
+            
+            if not running:
+                break
+            
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    succeeded = future.result()
+                except Exception as e:
+                    logger.error(f"Stage {name} raised: {e}")
+                    succeeded = False
+                
+                if succeeded:
+                    completed.add(name)
+                else:
+                    failed.append(name)
     
-    return True
-
-def import_work_at_relationships(driver):
-    """Import work at relationships"""
-    work_at_path = "test/dynamic/person_workAt_organisation_0_0.csv"
-    work_at_data = load_csv_data(work_at_path)
-    
-    if work_at_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Person", "WORK_AT", "Company", 
-            work_at_data,
-            "Person.id", "Organisation.id",
-            props={"workFrom": "workFrom"}
-        )
-    else:
-        logger.error(f"Failed to process work at relationships from {work_at_path}")
+    if failed or remaining:
+        logger.error(f"Import stopped: failed stages {', '.join(failed) or 'none'}, "
+                     f"{len(remaining)} stages not started")
         return False
     
+    logger.info(f"Completed {len(completed)} stages in {time.time() - start_time:.2f} seconds")
     return True
 
-def import_study_at_relationships(driver):
-    """Import study at relationships"""
-    study_at_path = "test/dynamic/person_studyAt_organisation_0_0.csv"
-    study_at_data = load_csv_data(study_at_path)
-    
-    if study_at_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Person", "STUDY_AT", "University", 
-            study_at_data,
-            "Person.id", "Organisation.id",
-            props={"classYear": "classYear"}
-        )
-    else:
-        logger.error(f"Failed to process study at relationships from {study_at_path}")
-        return False
-    
-    return True
+def import_header_field(name, dtype):
+    """Header field with the neo4j-admin type annotation matching a pandas dtype"""
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return f"{name}:datetime"
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return f"{name}:date"
+    if pd.api.types.is_bool_dtype(dtype):
+        return f"{name}:boolean"
+    if pd.api.types.is_integer_dtype(dtype):
+        return f"{name}:long"
+    if pd.api.types.is_float_dtype(dtype):
+        return f"{name}:double"
+    return name
 
-def import_comment_hasCreator_person(driver):
-    """Import comment has creator relationships"""
-    comment_creator_path = "test/dynamic/comment_hasCreator_person_0_0.csv"
-    comment_creator_data = load_csv_data(comment_creator_path)
-    
-    if comment_creator_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Comment", "HAS_CREATOR_COMMENT", "Person", 
-            comment_creator_data,
-            "Comment.id", "Person.id"
-        )
-    else:
-        logger.error(f"Failed to process comment has creator relationships from {comment_creator_path}")
-        return False
-    
-    return True
+def format_import_temporals(chunk):
+    """Format temporal columns the way neo4j-admin parses :datetime and :date fields"""
+    for col, dtype in chunk.dtypes.items():
+        if isinstance(dtype, pd.DatetimeTZDtype):
+            chunk[col] = chunk[col].dt.strftime("%Y-%m-%dT%H:%M:%S.%f%z")
+        elif pd.api.types.is_datetime64_dtype(dtype):
+            chunk[col] = chunk[col].dt.strftime("%Y-%m-%d")
+    return chunk
 
-def import_post_hasCreator_person(driver):
-    """Import post has creator relationships"""
-    post_creator_path = "test/dynamic/post_hasCreator_person_0_0.csv"
-    post_creator_data = load_csv_data(post_creator_path)
-    
-    if post_creator_data is not None:
-        # Create relationships
-        create_relationships(
-            driver, 
-            "Post", "HAS_CREATOR_POST", "Person", 
-            post_creator_data,
-            "Post.id", "Person.id"
-        )
-    else:
-        logger.error(f"Failed to process post has creator relationships from {post_creator_path}")
-        return False
-    
-    return True
+def write_import_file(chunks, file_path, header_fields):
+    """Stream DataFrame chunks into a neo4j-admin import file, typing columns from the first chunk"""
+    rows = 0
+    header = None
+    with open(file_path, "w", encoding="utf-8", newline="") as f:
+        for chunk in chunks:
+            if header is None:
+                header = header_fields(chunk)
+                f.write(",".join(header) + "\n")
+            format_import_temporals(chunk.copy()).to_csv(f, header=False, index=False, na_rep="")
+            rows += len(chunk)
+    return rows
 
-def main():
-    # Connect to database
-    driver = connect_to_db()
-    if not driver:
-        return
+def export_bulk_import(output_dir):
+    """Write node and relationship files for neo4j-admin database import.
     
-    try:
-        # Clear existing data
-        clear_db(driver)
-        
-        # Create indices to speed up operations
-        create_indices(driver)
-        
-        # Import nodes first, then relationships
-        
-        # Import Person nodes
-        if not import_person_data(driver):
-            return
-        
-        # Import Tag nodes
-        if not import_tag_data(driver):
-            return
-        
-        # Import Comment nodes
-        if not import_comment_data(driver):
-            return
-        
-        # Import Forum nodes
-        if not import_forum_data(driver):
-            return
-        
-        # Import Post nodes
-        if not import_post_data(driver):
-            return
-        
-        # Import Organization nodes (Universities and Companies)
-        if not import_organization_data(driver):
-            return
-        
-        # Now import relationships
-        
-        # Person knows Person
-        if not import_knows_relationships(driver):
-            return
+    Returns the importer arguments, or None if an input file is missing.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    args = ["--id-type=integer", "--skip-bad-relationships=true", "--skip-duplicate-nodes=true"]
+    
+    for spec in NODE_IMPORTS:
+        data = load_csv_data(spec["path"], stream=True, usecols=node_columns(spec))
+        if data is None:
+            return None
         
-        # Person has interest in Tag
-        if not import_interest_relationships(driver):
-            return
+        label = spec["label"]
+        file_path = os.path.abspath(os.path.join(output_dir, f"{label}.csv"))
+        chunks = map_frames(data, lambda df: prepare_node_frame(df, spec))
         
-        # Person likes Comment
-        if not import_likes_comment_relationships(driver):
-            return
+        def header_fields(chunk):
+            return [f"id:ID({label})" if col == "id" else import_header_field(col, dtype)
+                    for col, dtype in chunk.dtypes.items()]
         
-        # Person is member of Forum
-        if not import_forum_member_relationships(driver):
-            return
+        rows = write_import_file(chunks, file_path, header_fields)
+        args.append(f"--nodes={label}={file_path}")
+        logger.info(f"Exported {rows} {label} nodes to {file_path}")
+    
+    for spec in RELATIONSHIP_IMPORTS:
+        # Relationship files only carry the endpoints and the mapped properties
+        columns = relationship_columns(spec)
+        data = load_csv_data(spec["path"], stream=True, usecols=columns)
+        if data is None:
+            return None
         
-        # Forum has moderator Person
-        if not import_forum_moderator_relationships(driver):
-            return
+        rel_type = spec["type"]
+        props = spec.get("props") or {}
+        names = dict(zip(props.values(), props.keys()))
+        file_name = f"{spec['start_label']}_{rel_type}_{spec['end_label']}.csv"
+        file_path = os.path.abspath(os.path.join(output_dir, file_name))
+        chunks = map_frames(data, lambda df: df[columns])
         
-        # Forum has Tag
-        if not import_forum_tag_relationships(driver):
-            return
+        def header_fields(chunk):
+            return [f":START_ID({spec['start_label']})", f":END_ID({spec['end_label']})"] + [
+                import_header_field(names[col], dtype) for col, dtype in list(chunk.dtypes.items())[2:]]
         
-        # Person likes Post
-        if not import_likes_post_relationships(driver):
+        rows = write_import_file(chunks, file_path, header_fields)
+        args.append(f"--relationships={rel_type}={file_path}")
+        logger.info(f"Exported {rows} {rel_type} relationships to {file_path}")
+    
+    logger.info("Run the offline import with: neo4j-admin database import full " + " ".join(args) + " neo4j")
+    return args
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Populate Neo4j with the LDBC dataset")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="concurrent sessions used to write relationship batches")
+    parser.add_argument("--backend", choices=["sync", "async"], default=BACKEND,
+                        help="write engine: sessions per worker, or pipelined async transactions")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="rows per batch, or the starting size of stages without a learned size")
+    parser.add_argument("--fixed-batches", action="store_true",
+                        help="always use --batch-size, without tuning it towards the target transaction time")
+    parser.add_argument("--target-tx-seconds", type=float, default=TARGET_TX_SECONDS,
+                        help="transaction duration the adaptive batch sizes aim for")
+    parser.add_argument("--stream", action="store_true", default=STREAMING,
+                        help="read CSV files chunk by chunk to keep memory bounded")
+    parser.add_argument("--stage-concurrency", type=int, default=STAGE_CONCURRENCY,
+                        help="maximum number of import stages running at the same time")
+    parser.add_argument("--merge", action="store_true", default=MERGE_MODE,
+                        help="MERGE nodes and relationships on id instead of CREATE")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"continue the import recorded in {CHECKPOINT_FILE} (implies --merge)")
+    parser.add_argument("--no-id-filter", action="store_true",
+                        help="send every relationship row, without checking its ids against the loaded nodes")
+    parser.add_argument("--no-materialize", action="store_true",
+                        help="do not precompute the analytics read by the GUI dashboards")
+    parser.add_argument("--materialize-only", action="store_true",
+                        help="only recompute the analytics on the loaded graph")
+    parser.add_argument("--rebuild-indexes", action="store_true",
+                        help="drop secondary indexes during the load and rebuild them afterwards")
+    parser.add_argument("--drop-database", action="store_true",
+                        help="clear the data by recreating the database when the server allows it")
+    parser.add_argument("--drop-schema", action="store_true",
+                        help="do not keep constraints and indexes when clearing the data")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS,
+                        help="processes parsing the CSV files into the cache before the load (0 to disable)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always parse the CSV files, without the columnar parse cache")
+    parser.add_argument("--metrics-dir", default=load_metrics.METRICS_DIR,
+                        help="directory of the JSON and Prometheus metrics reports")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="do not write the metrics reports")
+    parser.add_argument("--export", metavar="DIR",
+                        help="write neo4j-admin import files to DIR instead of loading the database")
+    return parser.parse_args()
+
+def main():
+    global WORKERS, STREAMING, MERGE_MODE, METRICS, FILTER_ENDPOINTS, ASYNC_LOADER
+    global BATCH_SIZE, ADAPTIVE_BATCHES, TARGET_TX_SECONDS, LEARNED_BATCH_SIZES, MATERIALIZE
+    args = parse_args()
+    MATERIALIZE = not args.no_materialize
+    WORKERS = args.workers
+    BATCH_SIZE = args.batch_size
+    ADAPTIVE_BATCHES = not args.fixed_batches
+    TARGET_TX_SECONDS = args.target_tx_seconds
+    if ADAPTIVE_BATCHES:
+        LEARNED_BATCH_SIZES = load_batch_sizes()
+    STREAMING = args.stream
+    FILTER_ENDPOINTS = not args.no_id_filter
+    # Batches after the last recorded offset may already be committed
+    MERGE_MODE = args.merge or args.resume
+    
+    if args.no_cache:
+        ldbc_csv.CACHE_DIR = None
+    evicted = ldbc_csv.evict_stale_cache()
+    if evicted:
+        logger.info(f"Evicted {evicted} stale parse cache entries")
+    
+    # Before any driver or thread exists, so the worker processes fork cleanly. Each worker
+    # parses a whole file, so streaming runs and exports skip it to keep memory bounded
+    if not args.materialize_only and not STREAMING and not args.export:
+        prefetch_inputs(args.parse_workers)
+    
+    if args.export:
+        export_bulk_import(args.export)
+        return
+    
+    # Connect to database
+    driver = connect_to_db()
+    if not driver:
+        return
+    
+    if args.backend == "async":
+        try:
+            ASYNC_LOADER = AsyncLoader()
+        except Exception as e:
+            logger.error(f"Failed to start the async loader: {e}")
+            driver.close()
             return
-        
-        # Comment is tagged with Tag
-        if not import_tag_comment_relationships(driver):
+    
+    if not args.no_metrics:
+        METRICS = LoadMetrics("neo4j", {"batch_size": BATCH_SIZE, "adaptive_batches": ADAPTIVE_BATCHES,
+                                        "workers": WORKERS, "backend": args.backend,
+                                        "streaming": STREAMING, "merge": MERGE_MODE,
+                                        "stage_concurrency": args.stage_concurrency})
+    
+    try:
+        if args.materialize_only:
+            # The graph is already loaded: run the materializations without their dependencies
+            stages = {name: {**stage, "depends_on": set()} for name, stage in build_stages().items()
+                      if stage["run"] is materialize}
+            run_stages(driver, stages, args.stage_concurrency)
             return
         
-        # Post is tagged with Tag
-        if not import_tag_post_relationships(driver):
-            return
+        if args.resume:
+            checkpoint = Checkpoint.load()
+            checkpoint.resume_with(row_order_settings())
+            logger.info(f"Resuming import: {len(checkpoint.completed)} stages completed, "
+                        f"{len(checkpoint.offsets)} partially loaded")
+        else:
+            # Clear existing data
+            clear_db(driver, drop_database=args.drop_database, preserve_schema=not args.drop_schema)
+            checkpoint = Checkpoint(settings=row_order_settings())
+            checkpoint.save()
         
-        # Person works at Company
-        if not import_work_at_relationships(driver):
-            return
+        # Create indices to speed up operations
+        create_indices(driver)
         
-        # Person studies at University
-        if not import_study_at_relationships(driver):
-            return
+        # Secondary indexes only slow the bulk writes down
+        dropped_indexes = drop_secondary_indexes(driver) if args.rebuild_indexes else []
         
-        # Comment has creator Person
-        if not import_comment_hasCreator_person(driver):
+        # Relationship stages start as soon as both endpoint labels are loaded
+        if not run_stages(driver, build_stages(), args.stage_concurrency, checkpoint):
             return
         
-        # Post has creator Person
-        if not import_post_hasCreator_person(driver):
-            return
+        rebuild_secondary_indexes(driver, dropped_indexes)
         
     except Exception as e:
         logger.error(f"Error during import process: {e}")
     finally:
         driver.close()
+        if ASYNC_LOADER is not None:
+            ASYNC_LOADER.close()
+        if METRICS:
+            logger.info(f"Wrote load metrics to {METRICS.write(args.metrics_dir)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file